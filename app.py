@@ -1,6 +1,8 @@
-import streamlit as st, os
-from packages.documents import load_document_to_faiss, load_document_to_pinecone
-from packages.agents import build_langgraph
+import streamlit as st, os, uuid
+from packages.documents import load_document_to_faiss, load_document_to_pinecone, document_id
+from packages.agents import build_langgraph, get_checkpointer, get_llm, run_analysis, resume_analysis, model_router, resolve_query
+from packages.clauses import answer_from_index
+from packages.comparison import compare_documents, format_aligned_clauses
 from packages.prompts import analysis_configs
 
 import warnings
@@ -13,6 +15,14 @@ def init_session_state():
         st.session_state.vectorstore = None
     if 'processed_files' not in st.session_state:
         st.session_state.processed_files = ""
+    if 'doc_id' not in st.session_state:
+        st.session_state.doc_id = None
+    if 'failed_run_id' not in st.session_state:
+        st.session_state.failed_run_id = None
+    if 'comparison_docs' not in st.session_state:
+        st.session_state.comparison_docs = {}
+    if 'comparison_results' not in st.session_state:
+        st.session_state.comparison_results = None
     # if 'pinecone_api_key' not in st.session_state:
     #     st.session_state.pinecone_api_key = None
 
@@ -69,12 +79,34 @@ def main():
                 if uploaded_file.name != st.session_state.processed_files:
                     with st.spinner("Processing document..."):
                         try:
-                            st.session_state.vectorstore = load_document_to_faiss(uploaded_file)
+                            st.session_state.vectorstore = load_document_to_faiss(uploaded_file, clause_llm=get_llm("clauses"))
+                            st.session_state.doc_id = document_id(uploaded_file)
                             # st.session_state.vectorstore = load_document_to_pinecone(uploaded_file)
                             st.session_state.processed_files = uploaded_file.name
                         except Exception as e:
                                 st.error(f"Error processing document: {str(e)}")
 
+            comparison_files = st.file_uploader(
+                "Upload Documents to Compare",
+                type=['pdf'],
+                accept_multiple_files=True,
+                help="Upload two or more documents to compare them in one consolidated report"
+            )
+            comparison_names = [file.name for file in comparison_files]
+            for name in list(st.session_state.comparison_docs):
+                if name not in comparison_names:
+                    del st.session_state.comparison_docs[name]
+            for file in comparison_files:
+                if file.name not in st.session_state.comparison_docs:
+                    with st.spinner(f"Processing {file.name}..."):
+                        try:
+                            st.session_state.comparison_docs[file.name] = {
+                                "vectorstore": load_document_to_faiss(file, clause_llm=get_llm("clauses")),
+                                "doc_id": document_id(file),
+                            }
+                        except Exception as e:
+                                st.error(f"Error processing {file.name}: {str(e)}")
+
             st.divider()
             st.header("🔍 Analysis Options")
             analysis_type = st.selectbox(
@@ -87,7 +119,13 @@ def main():
                     "Custom Query"
                 ]
             )
-            st.session_state.legal_ai = build_langgraph()
+            rerank = st.checkbox(
+                "Rerank retrieved clauses",
+                value=False,
+                help="Retrieve a wider candidate set and keep only the most relevant chunks (local CPU cross-encoder)"
+            )
+            if st.session_state.get("legal_ai") is None:
+                st.session_state.legal_ai = build_langgraph(checkpointer=get_checkpointer())
         else:
             st.info("Enter Groq API key to upload documents")
 
@@ -110,6 +148,19 @@ def main():
         st.header(f"📋 {analysis_configs[analysis_type]['description']}")
         st.write(f"🤖 Active Agents: {', '.join(analysis_configs[analysis_type]['agents'])}")
 
+        question = st.text_input(
+            "⚡ Quick clause lookup",
+            help="Answered instantly from the clause index, e.g. 'What is the termination notice period?'"
+        )
+        if question:
+            records = answer_from_index(question, st.session_state.doc_id)
+            if records:
+                for record in records:
+                    page = record['page'] + 1 if record['page'] is not None else "?"
+                    st.markdown(f"**{record['value']}** (p. {page})\n\n> {record['quote']}")
+            else:
+                st.info("Not found in the clause index, run an analysis instead.")
+
         if analysis_type == "Custom Query":
             custom_query = st.text_area(
                 "Enter your specific query:",
@@ -118,15 +169,42 @@ def main():
         else:
             custom_query = ""
 
+        final_state, run_id = None, None
         if st.button("Run Analysis"):
-            
-            
-            final_state = st.session_state.legal_ai.invoke({
-                "analysis_type": analysis_type,
-                "custom_query": custom_query,
-                "vectorstore": st.session_state.vectorstore,
-            })
-            
+            # Remember the run until it succeeds so it can be resumed
+            st.session_state.failed_run_id = run_id = uuid.uuid4().hex
+            try:
+                _, final_state = run_analysis(
+                    st.session_state.legal_ai,
+                    analysis_type=analysis_type,
+                    custom_query=custom_query,
+                    vectorstore=st.session_state.vectorstore,
+                    run_id=st.session_state.failed_run_id,
+                    rerank=rerank,
+                    doc_id=st.session_state.doc_id,
+                )
+                st.session_state.failed_run_id = None
+            except Exception as e:
+                st.error(f"Analysis failed, completed steps were saved: {str(e)}")
+
+        # Drawn after the run so it shows up right after a failure
+        if st.session_state.failed_run_id and st.button(
+            "Resume Last Run",
+            key="resume_run",
+            help="Continue the failed run from its last checkpoint without repeating completed agents"
+        ):
+            run_id = st.session_state.failed_run_id
+            try:
+                final_state = resume_analysis(
+                    st.session_state.legal_ai,
+                    run_id=st.session_state.failed_run_id,
+                    vectorstore=st.session_state.vectorstore,
+                )
+                st.session_state.failed_run_id = None
+            except Exception as e:
+                st.error(f"Resume failed, completed steps were saved: {str(e)}")
+
+        if final_state:
             tabs = st.tabs(["Analysis", "Key Points", "Recommendations"])
 
             response = final_state["reports"]
@@ -153,9 +231,93 @@ def main():
                     st.markdown(response['recommendation'])
                 else:
                     st.markdown("No detailed analysis available for this analysis type.")
+
+            with st.expander("📈 Model Usage (this run)"):
+                st.json(model_router.usage_report(run_id))
+            with st.expander("📈 Model Usage (all sessions since server start)"):
+                st.json(model_router.usage_report())
     else:
         st.info("Please upload a legal document to begin analysis")    
 
+    if st.session_state.groq_api_key and len(st.session_state.comparison_docs) >= 2:
+        st.divider()
+        st.header(f"⚖️ {analysis_type} Comparison")
+        st.write(f"📄 Documents: {', '.join(st.session_state.comparison_docs)}")
+
+        comparison_query = st.text_input(
+            "Comparison focus:",
+            value="Compare the liability clauses across these documents.",
+            help="Used when the analysis type is Custom Query"
+        )
+
+        # Saved results are only reused for the same analysis, query and documents
+        comparison_key = (
+            analysis_type,
+            resolve_query(analysis_type, comparison_query),
+            rerank,
+            tuple(sorted((name, doc["doc_id"]) for name, doc in st.session_state.comparison_docs.items())),
+        )
+        if st.session_state.comparison_results and st.session_state.comparison_results["key"] != comparison_key:
+            st.session_state.comparison_results = None
+
+        def run_comparison(completed=None):
+            with st.spinner("Comparing documents..."):
+                try:
+                    comparison = compare_documents(
+                        {name: doc["vectorstore"] for name, doc in st.session_state.comparison_docs.items()},
+                        analysis_type=analysis_type,
+                        custom_query=comparison_query,
+                        doc_ids={name: doc["doc_id"] for name, doc in st.session_state.comparison_docs.items()},
+                        rerank=rerank,
+                        completed=completed,
+                    )
+                except Exception as e:
+                    st.error(f"Comparison failed: {str(e)}")
+                    return None
+            for name, failed in comparison["errors"].items():
+                for agent, error in failed.items():
+                    st.error(f"{name} - {agent} failed: {error}")
+            # Keep the agent results that succeeded so a retry only re-runs the failed ones
+            st.session_state.comparison_results = (
+                {"key": comparison_key, "results": comparison["results"]} if comparison["errors"] else None
+            )
+            return comparison
+
+        comparison = None
+        if st.button("Run Comparison"):
+            comparison = run_comparison()
+
+        # Drawn after the run so it shows up right after a partial failure
+        if st.session_state.comparison_results is not None and st.button(
+            "Retry Failed Documents",
+            key="retry_comparison",
+            help="Only re-run the agents that failed in the last comparison"
+        ):
+            comparison = run_comparison(completed=st.session_state.comparison_results["results"])
+
+        if comparison:
+            st.caption(
+                f"Compared {comparison['stats']['documents']} documents in {comparison['stats']['seconds']}s"
+            )
+            tabs = st.tabs(["Clause Alignment", "Analysis", "Key Points", "Recommendations"])
+            reports = comparison["reports"]
+            missing = "No consolidated report, retry the failed documents first."
+            with tabs[0]:
+                st.markdown("### Clause Alignment")
+                if comparison["clauses"]:
+                    st.text(format_aligned_clauses(comparison["clauses"], list(st.session_state.comparison_docs)))
+                else:
+                    st.markdown("No indexed clauses to align for these documents.")
+            with tabs[1]:
+                st.markdown("### Detailed Analysis")
+                st.markdown(reports.get("details", missing))
+            with tabs[2]:
+                st.markdown("### Key Points")
+                st.markdown(reports.get("summary", missing))
+            with tabs[3]:
+                st.markdown("### Recommendations")
+                st.markdown(reports.get("recommendation", missing))
+
 if __name__ == "__main__":
     
     main()
\ No newline at end of file
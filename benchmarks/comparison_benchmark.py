@@ -0,0 +1,43 @@
+"""
+Measures how multi-document comparison time scales with document count under stub
+models, sequential versus bounded parallelism, and how many tokens the consolidated
+detail prompt takes once per-document findings are condensed.
+
+    python -m benchmarks.comparison_benchmark
+"""
+from benchmarks.stubs import make_contract_chunks, make_vectorstore, StubLLM
+from packages import agents
+from packages.comparison import compare_documents
+
+DOCUMENT_COUNTS = [1, 2, 5, 10, 20]
+WORKER_COUNTS = [1, 4, 8]
+
+
+def main():
+    # Replies the length of a real agent answer, so findings outgrow the detail prompt
+    llm = StubLLM(base_latency=0.1, reply=" ".join(["Stub analysis of the liability cap and indemnity terms."] * 40))
+    agents.get_llm = llm.runnable
+    documents = {
+        f"vendor_{i:02d}.pdf": make_vectorstore(make_contract_chunks(n_chunks=12, seed=i, source=f"vendor_{i:02d}.pdf"))
+        for i in range(max(DOCUMENT_COUNTS))
+    }
+
+    print(f"{'docs':>5} " + " ".join(f"{f'{workers} workers (s)':>16}" for workers in WORKER_COUNTS)
+          + f" {'detail tokens':>14} {'condense calls':>15}")
+    for count in DOCUMENT_COUNTS:
+        subset = dict(list(documents.items())[:count])
+        timings = []
+        for workers in WORKER_COUNTS:
+            result = compare_documents(
+                subset,
+                analysis_type="Custom Query",
+                custom_query="Compare the liability clauses",
+                max_workers=workers
+            )
+            timings.append(result["stats"]["seconds"])
+        print(f"{count:>5} " + " ".join(f"{seconds:>16.2f}" for seconds in timings)
+              + f" {result['stats']['detail_prompt_tokens']:>14} {result['stats']['condense_calls']:>15}")
+
+
+if __name__ == "__main__":
+    main()
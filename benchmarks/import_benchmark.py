@@ -0,0 +1,96 @@
+"""
+Profiles cold import time of app.py and each package module, each in a fresh
+interpreter, using ``python -X importtime``.
+
+    python -m benchmarks.import_benchmark [--repeats 5] [--top 5]
+
+Reports the median wall time per module and the third-party packages whose imports
+cost the most time under it, summing the self time of every nested import by top-level
+package so nothing is counted twice.
+"""
+import argparse, os, re, statistics, subprocess, sys, time
+
+MODULES = [
+    "packages.prompts",
+    "packages.backends",
+    "packages.extraction",
+    "packages.rerank",
+    "packages.clauses",
+    "packages.agents",
+    "packages.documents",
+    "packages.comparison",
+    "app",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile(module: str) -> tuple[float, list[tuple[int, str]]]:
+    """
+    Imports a module in a fresh interpreter.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        tuple[float, list[tuple[int, str]]]: Wall seconds, and (microseconds, package) for
+            every third-party top-level package imported under the module.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    lines = [
+        (int(match.group(1)), len(match.group(3)), match.group(4))
+        for match in map(IMPORTTIME_LINE.match, completed.stderr.splitlines()) if match
+    ]
+    # A module's line follows the lines of everything it imported, which are indented
+    # deeper, so its imports are the deeper lines right before it. This skips the
+    # interpreter's own startup imports (site, encodings, ...). Modules loaded at startup
+    # (e.g. sys) have no line of their own.
+    targets = [i for i, (_, indent, name) in enumerate(lines) if indent == 1 and name == module]
+    if not targets:
+        return seconds, []
+    start = end = targets[-1]
+    while start > 0 and lines[start - 1][1] > 1:
+        start -= 1
+
+    by_package = {}
+    for microseconds, _, name in lines[start:end]:
+        package = name.split(".")[0]
+        # Only third-party packages, not the repo's own modules or the standard library
+        if package != "packages" and package not in sys.stdlib_module_names:
+            by_package[package] = by_package.get(package, 0) + microseconds
+    return seconds, [(microseconds, package) for package, microseconds in by_package.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = statistics.median(profile("sys")[0] for _ in range(args.repeats))
+    print(f"{'(interpreter startup)':<22} {baseline * 1000:>8.0f} ms")
+
+    for module in MODULES:
+        try:
+            runs = [profile(module) for _ in range(args.repeats)]
+        except RuntimeError as e:
+            print(f"{module:<22} failed: {e}")
+            continue
+        median = statistics.median(seconds for seconds, _ in runs)
+        print(f"{module:<22} {median * 1000:>8.0f} ms")
+        slowest = sorted(runs[-1][1], reverse=True)[:args.top]
+        for microseconds, name in slowest:
+            print(f"{'':<24}{microseconds / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
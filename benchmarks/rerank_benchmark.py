@@ -0,0 +1,56 @@
+"""
+Compares the default retriever with the reranking stage on the offline stub setup.
+
+    python -m benchmarks.rerank_benchmark
+
+Reports end-to-end latency and prompt tokens per agentic_rag call. Uses the local
+cross-encoder when sentence-transformers is installed, word overlap otherwise.
+"""
+from benchmarks.stubs import make_contract_chunks, make_vectorstore, lexical_scores, StubLLM
+from packages import agents
+from packages.rerank import Reranker, reranked_retriever, cross_encoder_scores
+import statistics, time
+
+QUERIES = [
+    "What is the termination notice period?",
+    "Is there a cap on liability?",
+    "When are invoices payable?",
+    "Which governing law applies?",
+]
+
+
+def run(vectorstore, rerank: bool, llm: StubLLM, repeats: int = 3) -> dict:
+    latencies = []
+    llm.prompt_tokens.clear()
+    for _ in range(repeats):
+        for query in QUERIES:
+            start = time.perf_counter()
+            agents.agentic_rag(vectorstore, task="contract", custom_query=query, rerank=rerank)
+            latencies.append(time.perf_counter() - start)
+    return {
+        "mean_latency_ms": round(statistics.mean(latencies) * 1000, 1),
+        "p95_latency_ms": round(sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000, 1),
+        "mean_prompt_tokens": round(statistics.mean(llm.prompt_tokens)),
+    }
+
+
+def main():
+    try:
+        cross_encoder_scores([("warm up", "warm up")])
+        score_fn, scorer = cross_encoder_scores, "cross-encoder"
+    except (ImportError, OSError):
+        score_fn, scorer = lexical_scores, "lexical stub"
+
+    vectorstore = make_vectorstore(make_contract_chunks(n_chunks=60))
+    llm = StubLLM()
+    agents.get_llm = llm.runnable
+    reranker = Reranker(score_fn=score_fn)
+    agents.reranked_retriever = lambda vs: reranked_retriever(vs, reranker=reranker)
+
+    print(f"Reranker scorer: {scorer}")
+    for name, rerank in (("default retriever", False), ("reranked", True)):
+        print(f"{name:>18}: {run(vectorstore, rerank, llm)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Offline stubs shared by the benchmarks: a synthetic contract corpus, deterministic
+fake embeddings and a chat model stand-in that records prompt sizes instead of
+calling Groq.
+"""
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableLambda
+from langchain_core.vectorstores import InMemoryVectorStore
+from packages.rerank import estimate_tokens
+import random, re, time
+
+CLAUSE_TEMPLATES = {
+    "termination": "Either party may terminate this Agreement upon {n} days written notice to the other party.",
+    "liability": "In no event shall either party's aggregate liability exceed {n} times the fees paid in the preceding twelve months.",
+    "payment": "The Client shall pay all undisputed invoices within {n} days of receipt by wire transfer.",
+    "governing_law": "This Agreement shall be governed by the laws of the State of {state}.",
+    "confidentiality": "Each party shall keep the Confidential Information of the other party secret for {n} years.",
+    "indemnity": "The Vendor shall indemnify the Client against third-party claims arising from breach, up to {n} million dollars.",
+}
+
+FILLER = (
+    "The parties acknowledge that the recitals form part of this Agreement and that headings "
+    "are for convenience only and shall not affect interpretation. "
+)
+
+
+def make_contract_chunks(n_chunks: int = 40, seed: int = 0, source: str = "contract.pdf") -> list[Document]:
+    """
+    Build a synthetic contract split into ~2000 character chunks, one clause per chunk.
+
+    Args:
+        n_chunks (int): Number of chunks to generate.
+        seed (int): Random seed so runs are comparable.
+        source (str): Source name stored in the chunk metadata.
+
+    Returns:
+        list[Document]: The generated chunks.
+    """
+    rng = random.Random(seed)
+    kinds = list(CLAUSE_TEMPLATES)
+    chunks = []
+    for i in range(n_chunks):
+        kind = kinds[i % len(kinds)]
+        clause = CLAUSE_TEMPLATES[kind].format(n=rng.randint(2, 90), state=rng.choice(["New York", "Delaware", "California"]))
+        text = f"Section {i + 1}. {clause} " + FILLER * 14
+        chunks.append(Document(page_content=text, metadata={"source": source, "page": i // 2, "clause": kind}))
+    return chunks
+
+
+def make_vectorstore(chunks: list[Document]):
+    """
+    Index chunks in an in-memory vectorstore with deterministic fake embeddings.
+
+    Args:
+        chunks (list[Document]): The chunks to index.
+
+    Returns:
+        InMemoryVectorStore: The populated vectorstore.
+    """
+    return InMemoryVectorStore.from_documents(chunks, DeterministicFakeEmbedding(size=256))
+
+
+def lexical_scores(pairs: list[tuple[str, str]]) -> list[float]:
+    """
+    Word-overlap relevance, a stand-in for the cross-encoder when it is not installed.
+
+    Args:
+        pairs (list[tuple[str, str]]): The (query, chunk) pairs to score.
+
+    Returns:
+        list[float]: One score per pair.
+    """
+    scores = []
+    for query, text in pairs:
+        words = set(query.lower().split())
+        scores.append(float(sum(word in words for word in text.lower().split()[:60])))
+    return scores
+
+
+class StubLLM:
+    """
+    Chat model stand-in. Sleeps a fixed base latency plus a per-token cost so prompt
+    size shows up in end-to-end time, and records the tokens of every prompt. Replies
+    are cut to the word limit of prompts asking for "at most N words".
+    """
+
+    def __init__(self, base_latency: float = 0.05, seconds_per_1k_tokens: float = 0.02, reply: str = "Stub analysis."):
+        self.base_latency = base_latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.reply = reply
+        self.prompt_tokens = []
+
+    def _call(self, prompt_value) -> str:
+        tokens = estimate_tokens(prompt_value.to_string())
+        self.prompt_tokens.append(tokens)
+        time.sleep(self.base_latency + self.seconds_per_1k_tokens * tokens / 1000)
+        limit = re.search(r"at most (\d+) words", prompt_value.to_string())
+        return " ".join(self.reply.split()[:int(limit.group(1))]) if limit else self.reply
+
+    def runnable(self, task: str = "default"):
+        return RunnableLambda(self._call)
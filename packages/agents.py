@@ -1,9 +1,21 @@
-from langgraph.graph import StateGraph, END, START
-from langchain_groq import ChatGroq
 from typing import TypedDict, Optional, Annotated, Any, List
-from langchain_core.runnables import RunnablePassthrough, RunnableMap, RunnableLambda
+from collections import OrderedDict
+from langchain_core.runnables import RunnablePassthrough, RunnableMap, RunnableLambda, RunnableConfig
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from packages.prompts import agent_prompts, task_prompts, analysis_configs
+from packages.rerank import reranked_retriever, estimate_tokens
+from packages.clauses import lookup_clauses, format_clause_context, route_question
+from packages.backends import load_backend, llm_backends
+import os, sqlite3, uuid, time, threading
+
+CHECKPOINT_DB = os.environ.get(
+    "LEGAL_AGENT_CHECKPOINT_DB",
+    os.path.join(os.path.expanduser("~"), ".cache", "ai-legal-agent", "checkpoints.sqlite")
+)
+
+# Retrieved chunks kept next to the indexed clause records matching the query
+CLAUSE_CONTEXT_CHUNKS = 1
 
 
 def merge_dicts(a: dict, b: dict) -> dict:
@@ -23,22 +35,267 @@ class AgentState(TypedDict):
     analysis_type: str
     custom_query: Optional[str]
     vectorstore: Any
+    rerank: Optional[bool]
+    doc_id: Optional[str]
+    prompt_overrides: Optional[dict[str, str]]
     results: Annotated[dict[str, str], merge_dicts]
     reports: Annotated[dict[str, str], merge_dicts]
 
-def get_llm():
+####################################### Model routing ###################################################
+
+# Chat model provider, a key of llm_backends
+LLM_PROVIDER = os.environ.get("LEGAL_AGENT_LLM_PROVIDER", "groq")
+
+# Models per node/task, preferred model first and cheaper fallbacks after it
+model_routes = {
+    "contract": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "research": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "strategy": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "detail": ["llama3-70b-8192", "llama3-8b-8192"],
+    "summary": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "recommendation": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "clauses": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "reduce": ["llama3-8b-8192", "llama-3.1-8b-instant"],
+    "default": ["llama3-8b-8192"],
+}
+
+# USD per million (input, output) tokens
+model_costs = {
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama3-70b-8192": (0.59, 0.79),
+}
+
+# Concurrent calls per model before new calls are routed to a fallback
+MODEL_MAX_IN_FLIGHT = 4
+# Seconds a model is skipped after it was rate limited
+MODEL_COOLDOWN = 30.0
+# Runs whose usage is kept for per-run reports, oldest dropped first
+MODEL_USAGE_RUNS = 256
+
+
+def default_chat_model_factory(model: str):
     """
-    Returns a ChatGroq model with the LLaMA3-8B-8192 model.
+    Creates a chat model of ``LLM_PROVIDER``, importing the provider on first use.
 
-    This model is a large language model that is suitable for generating text based on a given prompt.
+    Args:
+        model (str): The model name.
 
     Returns:
-        ChatGroq: The LLaMA3-8B-8192 model.
+        BaseChatModel: The chat model.
     """
-    return ChatGroq(model="llama3-8b-8192")
+    return load_backend(llm_backends, LLM_PROVIDER)(model=model)
 
 
-def agentic_rag(vectorstore, task: str,custom_query:str):
+class ModelRouter:
+    """
+    Routes LLM calls to models per task, falls back to cheaper models when the preferred
+    one is rate limited or saturated, and records per-model latency, tokens and cost,
+    both for the whole process and per run (the ``thread_id`` of the run config).
+
+    The chat model factory can be swapped (e.g. for ``FakeListChatModel``) to run the
+    routing offline.
+    """
+
+    def __init__(self, routes: dict = model_routes, chat_model_factory=default_chat_model_factory,
+                 max_in_flight: int = MODEL_MAX_IN_FLIGHT, cooldown: float = MODEL_COOLDOWN):
+        self.routes = routes
+        self.chat_model_factory = chat_model_factory
+        self.max_in_flight = max_in_flight
+        self.cooldown = cooldown
+        self.models = {}
+        self.in_flight = {}
+        self.limited_until = {}
+        self.stats = {}
+        self.run_stats = OrderedDict()
+        self.lock = threading.Lock()
+
+    def chat_model(self, model: str):
+        """
+        Returns the chat model instance for a model name, created once per router.
+
+        Args:
+            model (str): The model name.
+
+        Returns:
+            BaseChatModel: The chat model.
+        """
+        with self.lock:
+            if model not in self.models:
+                self.models[model] = self.chat_model_factory(model)
+            return self.models[model]
+
+    def acquire(self, task: str, tried: list[str] = ()):
+        """
+        Picks the model for a call and counts it as in flight, in one locked step so
+        concurrent calls can't all pass the ``max_in_flight`` check.
+
+        Rate-limited or saturated models are skipped; if every untried model is, the
+        last (cheapest) untried one is used anyway.
+
+        Args:
+            task (str): The node or task name, a key of ``routes``.
+            tried (list[str]): Models already tried for this call.
+
+        Returns:
+            str or None: The model name, or None if every model of the route was tried.
+        """
+        route = self.routes.get(task) or self.routes["default"]
+        now = time.monotonic()
+        with self.lock:
+            untried = [model for model in route if model not in tried]
+            if not untried:
+                return None
+            available = [
+                model for model in untried
+                if self.limited_until.get(model, 0) <= now and self.in_flight.get(model, 0) < self.max_in_flight
+            ]
+            model = (available or untried[-1:])[0]
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+            return model
+
+    def record(self, model: str, task: str, seconds: float, input_tokens: int, output_tokens: int,
+               error: bool = False, run_id: str = None):
+        """
+        Adds one call to the per-model usage stats of the process and of its run.
+
+        Args:
+            model (str): The model name.
+            task (str): The node or task name.
+            seconds (float): The call latency.
+            input_tokens (int): Prompt tokens.
+            output_tokens (int): Completion tokens.
+            error (bool): Whether the call failed.
+            run_id (str): The run the call belongs to, if any.
+        """
+        input_cost, output_cost = model_costs.get(model, (0.0, 0.0))
+        with self.lock:
+            usage = [self.stats]
+            if run_id is not None:
+                usage.append(self.run_stats.setdefault(run_id, {}))
+                self.run_stats.move_to_end(run_id)
+                while len(self.run_stats) > MODEL_USAGE_RUNS:
+                    self.run_stats.popitem(last=False)
+            for by_model in usage:
+                stats = by_model.setdefault(model, {
+                    "calls": 0, "errors": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "tasks": {}
+                })
+                stats["calls"] += 1
+                stats["errors"] += int(error)
+                stats["seconds"] += seconds
+                stats["input_tokens"] += input_tokens
+                stats["output_tokens"] += output_tokens
+                stats["cost"] += (input_tokens * input_cost + output_tokens * output_cost) / 1e6
+                stats["tasks"][task] = stats["tasks"].get(task, 0) + 1
+
+    def invoke(self, task: str, prompt_value, config: RunnableConfig = None):
+        """
+        Calls the routed model for a task, falling back on rate limits.
+
+        Args:
+            task (str): The node or task name.
+            prompt_value (PromptValue): The formatted prompt.
+            config (RunnableConfig): The run config, passed through for callbacks.
+
+        Returns:
+            AIMessage: The model response.
+        """
+        input_tokens = estimate_tokens(prompt_value.to_string())
+        run_id = ((config or {}).get("configurable") or {}).get("thread_id")
+        tried, rate_limit = [], None
+        while True:
+            model = self.acquire(task, tried)
+            if model is None:
+                raise rate_limit
+            tried.append(model)
+            start = time.perf_counter()
+            try:
+                message = self.chat_model(model).invoke(prompt_value, config)
+            except Exception as exc:
+                self.record(model, task, time.perf_counter() - start, input_tokens, 0, error=True, run_id=run_id)
+                if getattr(exc, "status_code", None) != 429:
+                    raise
+                with self.lock:
+                    self.limited_until[model] = time.monotonic() + self.cooldown
+                print(f"Model {model} rate limited, falling back to the next model")
+                rate_limit = exc
+                continue
+            finally:
+                with self.lock:
+                    self.in_flight[model] -= 1
+
+            usage = getattr(message, "usage_metadata", None) or {}
+            self.record(
+                model, task, time.perf_counter() - start,
+                usage.get("input_tokens", input_tokens),
+                usage.get("output_tokens", estimate_tokens(getattr(message, "content", str(message)))),
+                run_id=run_id
+            )
+            return message
+
+    def usage_report(self, run_id: str = None) -> dict:
+        """
+        Per-model usage of one run, or of the whole process since start, for tuning
+        ``model_routes``.
+
+        Args:
+            run_id (str): The run to report, including its resumes. Reports the whole
+                          process if omitted.
+
+        Returns:
+            dict: Per model: calls, errors, mean latency, tokens, cost and calls per task.
+        """
+        with self.lock:
+            by_model = self.stats if run_id is None else self.run_stats.get(run_id, {})
+            return {
+                model: {
+                    **{key: value for key, value in stats.items() if key != "seconds"},
+                    "mean_latency": round(stats["seconds"] / stats["calls"], 3),
+                    "cost": round(stats["cost"], 6),
+                    "tasks": dict(stats["tasks"]),
+                }
+                for model, stats in by_model.items()
+            }
+
+
+model_router = ModelRouter()
+
+
+def get_llm(task: str = "default"):
+    """
+    Returns the chat model for a node or task, routed by ``model_router``.
+
+    Fast models serve the agents and short reports, a stronger model serves the detailed
+    analysis, see ``model_routes``.
+
+    Args:
+        task (str): The node or task name (e.g. "contract", "detail", "summary").
+
+    Returns:
+        RunnableLambda: A runnable mapping a prompt to the model's AIMessage.
+    """
+    return RunnableLambda(lambda prompt_value, config: model_router.invoke(task, prompt_value, config))
+
+
+def get_vectorstore(state: AgentState, config: RunnableConfig = None):
+    """
+    Returns the vectorstore for a run.
+
+    Checkpointed runs pass the vectorstore through ``config["configurable"]`` so it is
+    never serialized into the checkpoint; plain runs may still pass it in the state.
+
+    Args:
+        state (AgentState): The current state of the agent.
+        config (RunnableConfig): The run config.
+
+    Returns:
+        VectorStore: The vectorstore to retrieve from.
+    """
+    vectorstore = ((config or {}).get("configurable") or {}).get("vectorstore")
+    return vectorstore if vectorstore is not None else state.get("vectorstore")
+
+
+def agentic_rag(vectorstore, task: str,custom_query:str, rerank: bool = False, doc_id: str = None):
     """
     Use a vectorstore to retrieve relevant documents and then ask a prompt to a large language model.
 
@@ -46,6 +303,11 @@ def agentic_rag(vectorstore, task: str,custom_query:str):
         vectorstore (VectorStore): The vectorstore to use for retrieving documents.
         task (str): The task to use (e.g. "contract", "research", "strategy").
         custom_query (str): The custom query to ask the model.
+        rerank (bool): Pull a wider candidate set and keep only the best chunks
+                       (scored by a local cross-encoder) under a token budget.
+        doc_id (str): ID of the document in the clause index. When it has records of the
+                      type the query asks about, they replace all but the top
+                      ``CLAUSE_CONTEXT_CHUNKS`` retrieved chunks.
 
     Returns:
         str: The result of the model's response.
@@ -62,14 +324,27 @@ def agentic_rag(vectorstore, task: str,custom_query:str):
         """
         return "\n\n".join(doc.page_content for doc in docs)
     
-    # Get LLM and vector retriever
-    llm = get_llm()
-    retriever = vectorstore.as_retriever()
+    # Get LLM and vector retriever, plus the indexed clauses the query asks about
+    llm = get_llm(task)
+    retriever = reranked_retriever(vectorstore) if rerank else vectorstore.as_retriever()
+    clause_type = route_question(custom_query or "") if doc_id else None
+    clause_records = lookup_clauses(doc_id, clause_type) if clause_type else []
+    if clause_records:
+        # The compact records replace most of the raw chunks, a few are kept for surrounding context
+        clause_context = "Indexed clauses:\n" + format_clause_context(clause_records)
+        context = (
+            retriever
+            | RunnableLambda(lambda docs: docs[:CLAUSE_CONTEXT_CHUNKS])
+            | format_docs
+            | RunnableLambda(lambda chunks: f"{clause_context}\n\n{chunks}")
+        )
+    else:
+        context = retriever | format_docs
 
     # Agentic Rag Chain
     agentic_rag = (
         {
-            "context": retriever | format_docs,
+            "context": context,
             "question": RunnablePassthrough()
         }
         | agent_prompts[task]
@@ -79,7 +354,7 @@ def agentic_rag(vectorstore, task: str,custom_query:str):
 
     return agentic_rag.invoke(custom_query)
 
-def agentic_task(response,task:str,agents:list[str]):
+def agentic_task(response,task:str,agents:list[str], prompt: str = None):
     """
     Executes an agentic task by processing a response and generating a text output using specified agents.
 
@@ -87,6 +362,8 @@ def agentic_task(response,task:str,agents:list[str]):
         response (str or dict): The response data to be processed. Can be a string or a dictionary of agent results.
         task (str): The task identifier which determines the task prompt to be used.
         agents (list[str]): A list of agent names involved in the task.
+        prompt (str): Optional human prompt template replacing the default task prompt.
+                      Receives the same ``{response}`` and ``{agents}`` variables.
 
     Returns:
         str: The resulting output from the large language model after processing the response with the task prompt.
@@ -106,10 +383,10 @@ def agentic_task(response,task:str,agents:list[str]):
         return "\n\n".join(f"{agent}:\n {result}" for agent,result in docs.items())
     
     # Get LLM and vector retriever
-    llm = get_llm()
+    llm = get_llm(task)
     print("Task name",task)
 
-    task_prompt = task_prompts[task]
+    task_prompt = ChatPromptTemplate(messages=[("human", prompt)]) if prompt else task_prompts[task]
 
     response_query = response if isinstance(response,str) else format_docs(response)
 
@@ -128,16 +405,47 @@ def agentic_task(response,task:str,agents:list[str]):
 
 
 
+def resolve_query(analysis_type: str, custom_query: str = None) -> str:
+    """
+    Returns the query the agents answer: the custom query for "Custom Query", the
+    predefined query of the analysis type otherwise.
+
+    Args:
+        analysis_type (str): The analysis type, a key of ``analysis_configs``.
+        custom_query (str): The custom query, used for "Custom Query".
+
+    Returns:
+        str: The query.
+    """
+    config = analysis_configs.get(analysis_type)
+    if not config:
+        raise ValueError(f"Invalid analysis type: {analysis_type}")
+    return custom_query if analysis_type == "Custom Query" else config["query"]
+
+
+def prepare_query(state: AgentState):
+    """
+    Entry node of the graph, stores the resolved query in the state so the agents (and
+    a resumed run) retrieve and rerank against it.
+
+    Args:
+        state (AgentState): The initial state, with the analysis type and custom query.
+
+    Returns:
+        dict: The state update, keyed by "custom_query".
+    """
+    return {"custom_query": resolve_query(state["analysis_type"], state.get("custom_query"))}
+
+
 def coordinator(state: AgentState):
     """
     Coordinates the analysis process based on the given agent state.
 
     This function retrieves the appropriate analysis configuration for the given 
-    analysis type in the agent state. It sets the custom query in the state if 
-    the analysis type is "Custom Query"; otherwise, it uses the predefined query 
-    from the configuration. The function then maps each agent in the configuration 
+    analysis type in the agent state and maps each agent in the configuration 
     to their respective task route, which includes "contract" for Contract Analyst, 
-    "research" for Legal Researcher, and "strategy" for Legal Strategist.
+    "research" for Legal Researcher, and "strategy" for Legal Strategist. The query
+    itself is resolved by ``prepare_query``, edge functions can't update the state.
 
     Args:
         state (AgentState): The current state of the agent, containing the analysis 
@@ -152,8 +460,6 @@ def coordinator(state: AgentState):
     if not config:
         raise ValueError(f"Invalid analysis type: {state['analysis_type']}")
 
-    state["custom_query"] = state["custom_query"] if state["analysis_type"] == "Custom Query" else config["query"]
-
     agent_routes = []
     for agent in config["agents"]:
         if agent == "Contract Analyst":
@@ -165,7 +471,7 @@ def coordinator(state: AgentState):
     return agent_routes
 
 
-def run_contract(state: AgentState):
+def run_contract(state: AgentState, config: RunnableConfig):
     """
     Executes the contract analysis task using the Contract Analyst agent.
 
@@ -175,6 +481,7 @@ def run_contract(state: AgentState):
     Args:
         state (AgentState): The current state of the agent, containing the vectorstore 
                             and custom query to be used for the analysis.
+        config (RunnableConfig): The run config, may carry the vectorstore.
 
     Returns:
         dict: A dictionary containing the results of the contract analysis, 
@@ -185,14 +492,16 @@ def run_contract(state: AgentState):
     return {
         "results": {
             "Contract Analyst": agentic_rag(
-                vectorstore=state["vectorstore"], 
+                vectorstore=get_vectorstore(state, config), 
                 task="contract", 
-                custom_query=state["custom_query"]
+                custom_query=state["custom_query"],
+                rerank=state.get("rerank", False),
+                doc_id=state.get("doc_id")
             )
         }
     }
 
-def run_research(state: AgentState):
+def run_research(state: AgentState, config: RunnableConfig):
     """
     Executes the legal research task using the Legal Researcher agent.
 
@@ -202,6 +511,7 @@ def run_research(state: AgentState):
     Args:
         state (AgentState): The current state of the agent, containing the vectorstore
                             and custom query to be used for the research.
+        config (RunnableConfig): The run config, may carry the vectorstore.
 
     Returns:
         dict: A dictionary containing the results of the legal research, keyed by
@@ -212,14 +522,16 @@ def run_research(state: AgentState):
     return {
         "results": {
             "Legal Researcher": agentic_rag(
-                vectorstore=state["vectorstore"], 
+                vectorstore=get_vectorstore(state, config), 
                 task="research", 
-                custom_query=state["custom_query"]
+                custom_query=state["custom_query"],
+                rerank=state.get("rerank", False),
+                doc_id=state.get("doc_id")
             )
         }
     }
 
-def run_strategy(state: AgentState):
+def run_strategy(state: AgentState, config: RunnableConfig):
    
     """
     Executes the legal strategy task using the Legal Strategist agent.
@@ -230,6 +542,7 @@ def run_strategy(state: AgentState):
     Args:
         state (AgentState): The current state of the agent, containing the vectorstore
                             and custom query to be used for the strategy development.
+        config (RunnableConfig): The run config, may carry the vectorstore.
 
     Returns:
         dict: A dictionary containing the results of the legal strategy development, keyed by
@@ -240,9 +553,11 @@ def run_strategy(state: AgentState):
     return {
         "results": {
             "Legal Strategist": agentic_rag(
-                vectorstore=state["vectorstore"], 
+                vectorstore=get_vectorstore(state, config), 
                 task="strategy", 
-                custom_query=state["custom_query"])
+                custom_query=state["custom_query"],
+                rerank=state.get("rerank", False),
+                doc_id=state.get("doc_id"))
         }
     }
 
@@ -269,7 +584,8 @@ def detail_analysis(state: AgentState):
             "details": agentic_task(
                 response=state["results"],
                 task="detail",
-                agents=analysis_configs[state["analysis_type"]]["agents"]
+                agents=analysis_configs[state["analysis_type"]]["agents"],
+                prompt=(state.get("prompt_overrides") or {}).get("detail")
             )
         }
     }
@@ -297,7 +613,8 @@ def summary_analysis(state: AgentState):
             "summary": agentic_task(
                 response=state["reports"]["details"],
                 task="summary",
-                agents=analysis_configs[state["analysis_type"]]["agents"]
+                agents=analysis_configs[state["analysis_type"]]["agents"],
+                prompt=(state.get("prompt_overrides") or {}).get("summary")
             )
         }
     }
@@ -325,7 +642,8 @@ def recommendation_analysis(state: AgentState):
             "recommendation": agentic_task(
                 response=state["reports"]["details"],
                 task="recommendation",
-                agents=analysis_configs[state["analysis_type"]]["agents"]
+                agents=analysis_configs[state["analysis_type"]]["agents"],
+                prompt=(state.get("prompt_overrides") or {}).get("recommendation")
             )
         }
     }
@@ -348,12 +666,63 @@ def combine_results(state: AgentState):
         merged.update(part)
     return {"results": merged}
 
-def build_langgraph():
+def retry_llm_call(exc: Exception) -> bool:
+    """
+    Decides whether a failed node should be retried.
+
+    Provider errors carrying an HTTP status are retried on rate limiting (429) and
+    server errors (5xx) only, so a bad API key (401) or an oversized prompt (400) fails
+    right away. Other exceptions are retried as LangGraph does by default (e.g.
+    connection errors).
+
+    Args:
+        exc (Exception): The exception raised by the node.
+
+    Returns:
+        bool: True if the node should be retried.
+    """
+    from langgraph.types import default_retry_on
+
+    status_code = getattr(exc, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code == 429 or status_code >= 500
+    return default_retry_on(exc)
+
+
+# Retry settings per node, see langgraph RetryPolicy. Agent and report nodes each make one LLM call.
+node_retry_settings = {
+    "contract": {"max_attempts": 3, "initial_interval": 2.0},
+    "research": {"max_attempts": 3, "initial_interval": 2.0},
+    "strategy": {"max_attempts": 3, "initial_interval": 2.0},
+    "detail": {"max_attempts": 4, "initial_interval": 2.0},
+    "summary": {"max_attempts": 3, "initial_interval": 1.0},
+    "recommendation": {"max_attempts": 3, "initial_interval": 1.0},
+}
+
+
+def get_checkpointer(path: str = CHECKPOINT_DB):
+    """
+    Returns a SQLite checkpointer so completed node outputs survive failures and restarts.
+
+    Args:
+        path (str): Path to the SQLite database file.
+
+    Returns:
+        SqliteSaver: The checkpointer.
+    """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+
+def build_langgraph(checkpointer=None):
     """
     Builds a StateGraph object representing the workflow of the legal analysis agent.
 
     This function constructs a StateGraph object that models the workflow of the legal
-    analysis agent. The workflow consists of four nodes: contract, research, strategy, and
+    analysis agent. The workflow starts at the query node, which resolves the query the
+    agents answer, followed by four nodes: contract, research, strategy, and
     detail. The contract node represents the contract analysis task, the research node
     represents the legal research task, the strategy node represents the legal strategy
     task, and the detail node represents the detail analysis task. The workflow also
@@ -361,7 +730,8 @@ def build_langgraph():
     node that represents the recommendation analysis task.
 
     The workflow is constructed by adding nodes to the StateGraph object and then adding
-    edges between the nodes. The edges are added in the following order:
+    edges between the nodes. The query node routes to the agents of the analysis type,
+    then the edges are added in the following order:
 
     1. The contract node is connected to the detail node.
     2. The research node is connected to the detail node.
@@ -371,22 +741,35 @@ def build_langgraph():
     6. The summary node is connected to the END node.
     7. The recommendation node is connected to the END node.
 
-    The workflow is then compiled into a runnable object and returned.
+    The workflow is then compiled into a runnable object and returned. Every node has a
+    retry policy, and when a checkpointer is given each completed node is persisted so a
+    failed run can be resumed with ``resume_analysis``.
+
+    Args:
+        checkpointer (BaseCheckpointSaver): Optional checkpointer, see ``get_checkpointer``.
 
     Returns:
         langchain_core.runnables.StateGraph: A StateGraph object representing the workflow
             of the legal analysis agent.
     """
+    from langgraph.graph import StateGraph, END, START
+    from langgraph.types import RetryPolicy
+
+    retry = {node: RetryPolicy(**settings, retry_on=retry_llm_call) for node, settings in node_retry_settings.items()}
+
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("contract", run_contract)
-    workflow.add_node("research", run_research)
-    workflow.add_node("strategy", run_strategy)
-    workflow.add_node("detail", detail_analysis)
-    workflow.add_node("summary", summary_analysis)
-    workflow.add_node("recommendation", recommendation_analysis)
-
-    workflow.add_conditional_edges(START, lambda state: coordinator(state), {
+    workflow.add_node("contract", run_contract, retry=retry["contract"])
+    workflow.add_node("research", run_research, retry=retry["research"])
+    workflow.add_node("strategy", run_strategy, retry=retry["strategy"])
+    workflow.add_node("detail", detail_analysis, retry=retry["detail"])
+    workflow.add_node("summary", summary_analysis, retry=retry["summary"])
+    workflow.add_node("recommendation", recommendation_analysis, retry=retry["recommendation"])
+
+    workflow.add_node("query", prepare_query)
+
+    workflow.add_edge(START, "query")
+    workflow.add_conditional_edges("query", lambda state: coordinator(state), {
         "contract": "contract",
         "research": "research",
         "strategy": "strategy"
@@ -402,10 +785,96 @@ def build_langgraph():
     workflow.add_edge("summary", END)
     workflow.add_edge("recommendation", END)
 
-    app = workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def run_config(run_id: str, vectorstore) -> dict:
+    """
+    Builds the config for a checkpointed run.
+
+    Args:
+        run_id (str): The run ID, used as the checkpoint thread ID.
+        vectorstore (VectorStore): The vectorstore, kept out of the checkpointed state.
+
+    Returns:
+        dict: The run config.
+    """
+    return {"configurable": {"thread_id": run_id, "vectorstore": vectorstore}}
+
+
+def run_analysis(legal_ai, analysis_type: str, custom_query: str, vectorstore, run_id: str = None, **state):
+    """
+    Starts a checkpointed analysis run.
+
+    Args:
+        legal_ai: A graph built with ``build_langgraph(checkpointer=...)``.
+        analysis_type (str): The analysis type, a key of ``analysis_configs``.
+        custom_query (str): The custom query, used for "Custom Query".
+        vectorstore (VectorStore): The vectorstore of the document.
+        run_id (str): The run ID to checkpoint under. A new one is generated if omitted.
+        **state: Extra initial state (e.g. ``rerank``, ``prompt_overrides``).
+
+    Returns:
+        tuple[str, dict]: The run ID and the final state.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    final_state = legal_ai.invoke(
+        {"analysis_type": analysis_type, "custom_query": custom_query, **state},
+        run_config(run_id, vectorstore)
+    )
+    return run_id, final_state
+
+
+def resume_analysis(legal_ai, run_id: str, vectorstore):
+    """
+    Resumes a failed or interrupted run from its last checkpoint.
+
+    Nodes that already completed (including agents that finished in the same step as
+    the one that failed) are not re-run.
+
+    Args:
+        legal_ai: A graph built with ``build_langgraph(checkpointer=...)``.
+        run_id (str): The run ID to resume.
+        vectorstore (VectorStore): The vectorstore of the document.
+
+    Returns:
+        dict: The final state.
+    """
+    config = run_config(run_id, vectorstore)
+    snapshot = legal_ai.get_state(config)
+    if not snapshot.next:
+        return snapshot.values
+    return legal_ai.invoke(None, config)
+
+
+def rerun_reports(legal_ai, run_id: str, prompts: dict[str, str]):
+    """
+    Re-runs only the given report nodes of a finished run with new prompts, reusing the
+    checkpointed agent results and detailed analysis.
+
+    Args:
+        legal_ai: A graph built with ``build_langgraph(checkpointer=...)``.
+        run_id (str): The run ID of a run that has completed ``detail``.
+        prompts (dict[str, str]): Prompt templates keyed by node ("summary" and/or
+                                  "recommendation"), see ``agentic_task``.
+
+    Returns:
+        dict: The updated final state.
+    """
+    report_nodes = {"summary": summary_analysis, "recommendation": recommendation_analysis}
+    if not set(prompts) <= set(report_nodes):
+        raise ValueError(f"Only {', '.join(report_nodes)} can be re-run, got: {', '.join(prompts)}")
+
+    config = run_config(run_id, None)
+    state = legal_ai.get_state(config).values
+    if "details" not in state.get("reports", {}):
+        raise ValueError(f"Run {run_id} has no detailed analysis to re-run reports from")
 
-    app.get_graph().draw_mermaid_png(output_file_path="workflow.png")
-    return workflow.compile()
+    state = {**state, "prompt_overrides": {**(state.get("prompt_overrides") or {}), **prompts}}
+    for node in prompts:
+        config = legal_ai.update_state(config, report_nodes[node](state), as_node=node)
+    return legal_ai.get_state(config).values
 
 if __name__ == "__main__":
-    build_langgraph()
\ No newline at end of file
+    # Redraw the workflow diagram used in the README
+    build_langgraph().get_graph().draw_mermaid_png(output_file_path="workflow.png")
\ No newline at end of file
@@ -0,0 +1,51 @@
+from functools import lru_cache
+import importlib
+
+####################################### Lazy backend registry ###################################################
+
+# Providers as "module:attribute", imported only when selected
+vectorstore_backends = {
+    "faiss": "langchain_community.vectorstores:FAISS",
+    "pinecone": "langchain_pinecone:PineconeVectorStore",
+}
+
+embedding_backends = {
+    "jina": "langchain_community.embeddings:JinaEmbeddings",
+    "huggingface": "langchain_huggingface:HuggingFaceEmbeddings",
+}
+
+llm_backends = {
+    "groq": "langchain_groq:ChatGroq",
+}
+
+
+@lru_cache(maxsize=None)
+def _import_backend(path: str):
+    """
+    Imports a "module:attribute" path.
+
+    Args:
+        path (str): The import path.
+
+    Returns:
+        Any: The imported attribute.
+    """
+    module, attribute = path.split(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+def load_backend(registry: dict[str, str], name: str):
+    """
+    Returns a provider class from a backend registry, importing its package on first use.
+
+    Args:
+        registry (dict[str, str]): One of ``vectorstore_backends``, ``embedding_backends``
+                                   or ``llm_backends``.
+        name (str): The provider name, e.g. "faiss" or "groq".
+
+    Returns:
+        type: The provider class.
+    """
+    if name not in registry:
+        raise ValueError(f"Unknown backend: {name}, available: {', '.join(registry)}")
+    return _import_backend(registry[name])
@@ -0,0 +1,267 @@
+from langchain_core.output_parsers import JsonOutputParser
+from packages.prompts import clause_extraction_prompt, clause_types
+from contextlib import contextmanager
+import os, re, sqlite3, time
+
+CLAUSE_DB = os.environ.get(
+    "LEGAL_AGENT_CLAUSE_DB",
+    os.path.join(os.path.expanduser("~"), ".cache", "ai-legal-agent", "clauses.sqlite")
+)
+
+# Chunks sent per extraction call, and extraction calls in flight at once
+CLAUSE_CHUNKS_PER_CALL = 3
+CLAUSE_MAX_CONCURRENCY = 4
+# Extra rounds for batches whose extraction call failed
+CLAUSE_RETRIES = 2
+
+# Keywords routing a question to a clause type, regexes matched against whole words
+clause_keywords = {
+    "parties": [r"part(y|ies)", r"between", r"signator(y|ies)", r"signed", r"counterpart(y|ies)"],
+    "dates": [r"dates?", r"effective", r"commenc(e|es|ed|ement)", r"expir(e|es|ed|y|ation)", r"renew(s|ed|al)?", r"duration"],
+    "payment_terms": [r"pa(y|ys|id|yable|yment|yments)", r"invoic(e|es|ed|ing)", r"fees?", r"pric(e|es|ing)", r"compensation", r"costs?"],
+    "termination": [r"terminat(e|es|ed|ing|ion)", r"cancel(s|led|lation)?", r"notice"],
+    "liability_cap": [r"liabilit(y|ies)", r"liable", r"caps?", r"capped", r"damages", r"indemni(ty|ties|fy|fies|fication)", r"limitations?"],
+    "governing_law": [r"governing", r"governed", r"jurisdictions?", r"venue", r"laws?", r"courts?", r"arbitrat(e|ion|or)"],
+}
+
+
+@contextmanager
+def connect(path: str = CLAUSE_DB):
+    """
+    Opens the clause index database, creating the tables on first use. Commits and
+    closes the connection on exit.
+
+    Args:
+        path (str): Path to the SQLite database file.
+
+    Yields:
+        sqlite3.Connection: The open connection.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS clauses ("
+        "doc_id TEXT NOT NULL, clause_type TEXT NOT NULL, value TEXT, quote TEXT, page INTEGER)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS clauses_doc_type ON clauses (doc_id, clause_type)")
+    # One row per indexed document, also for documents without any clause records
+    created = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'indexed_documents'").fetchone() is None
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS indexed_documents ("
+        "doc_id TEXT PRIMARY KEY, records INTEGER NOT NULL, indexed_at REAL NOT NULL)"
+    )
+    if created:
+        # Databases from before the table existed only stored complete indexes
+        conn.execute(
+            "INSERT OR IGNORE INTO indexed_documents SELECT doc_id, COUNT(*), ? FROM clauses GROUP BY doc_id", (time.time(),)
+        )
+        conn.commit()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def has_clause_index(doc_id: str, path: str = CLAUSE_DB) -> bool:
+    """
+    Checks whether a document has already been indexed.
+
+    Args:
+        doc_id (str): The document ID.
+        path (str): Path to the SQLite database file.
+
+    Returns:
+        bool: True if the document's clauses were extracted, even if none were found.
+    """
+    with connect(path) as conn:
+        return conn.execute("SELECT 1 FROM indexed_documents WHERE doc_id = ?", (doc_id,)).fetchone() is not None
+
+
+def extract_clauses(chunks: list, llm, chunks_per_call: int = CLAUSE_CHUNKS_PER_CALL,
+                    max_concurrency: int = CLAUSE_MAX_CONCURRENCY, retries: int = CLAUSE_RETRIES):
+    """
+    Extracts typed clause records from document chunks with batched, parallel LLM calls.
+    Batches whose call fails or returns invalid JSON are retried.
+
+    Args:
+        chunks (list[Document]): The document chunks, with "page" in their metadata.
+        llm (BaseChatModel): The chat model to extract with.
+        chunks_per_call (int): Number of chunks packed into each LLM call.
+        max_concurrency (int): Number of LLM calls in flight at once.
+        retries (int): Extra rounds for failed batches.
+
+    Returns:
+        tuple[list[dict], int]: Clause records with clause_type, value, quote and page,
+            and the number of batches that still failed after retrying.
+    """
+    def format_chunks(batch):
+        """
+        Number the chunks of a batch so records can point back to their page.
+
+        Args:
+            batch (list[Document]): The chunks of one LLM call.
+
+        Returns:
+            str: The formatted chunks.
+        """
+        return "\n\n".join(f"[chunk {i}]\n{doc.page_content}" for i, doc in enumerate(batch))
+
+    batches = [chunks[i:i + chunks_per_call] for i in range(0, len(chunks), chunks_per_call)]
+    extraction = clause_extraction_prompt | llm | JsonOutputParser()
+    types_description = "\n".join(f"- {name}: {description}" for name, description in clause_types.items())
+
+    records, pending = [], batches
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        outputs = extraction.batch(
+            [{"clause_types": types_description, "chunks": format_chunks(batch)} for batch in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True
+        )
+        failed = []
+        for batch, output in zip(pending, outputs):
+            if isinstance(output, Exception) or not isinstance(output, list):
+                print("Clause extraction failed for a batch:", output)
+                failed.append(batch)
+                continue
+            records.extend(parse_clause_records(output, batch))
+        pending = failed
+    return records, len(pending)
+
+
+def parse_clause_records(output: list, batch: list) -> list[dict]:
+    """
+    Validates the JSON items of one extraction call and maps them to their page.
+
+    Args:
+        output (list): The parsed JSON list returned by the model.
+        batch (list[Document]): The chunks of the call.
+
+    Returns:
+        list[dict]: Clause records with clause_type, value, quote and page.
+    """
+    records = []
+    for item in output:
+        if not isinstance(item, dict) or item.get("type") not in clause_types:
+            continue
+        chunk = item.get("chunk")
+        doc = batch[chunk] if isinstance(chunk, int) and 0 <= chunk < len(batch) else batch[0]
+        records.append({
+            "clause_type": item["type"],
+            "value": str(item.get("value", "")).strip(),
+            "quote": str(item.get("quote", "")).strip(),
+            "page": doc.metadata.get("page"),
+        })
+    return records
+
+
+def build_clause_index(chunks: list, doc_id: str, llm, path: str = CLAUSE_DB) -> dict:
+    """
+    Extracts clause records for a document and stores them in the local clause index,
+    replacing any previous records for the same document. The document is recorded as
+    indexed even when no clauses were found, so it isn't extracted again. Nothing is
+    stored if any batch still failed after retrying, so an incomplete index is never
+    treated as done and the document is extracted again on its next upload.
+
+    Args:
+        chunks (list[Document]): The document chunks.
+        doc_id (str): The document ID.
+        llm (BaseChatModel): The chat model to extract with.
+        path (str): Path to the SQLite database file.
+
+    Returns:
+        dict: Index stats (records, failed_batches, stored, seconds).
+    """
+    start = time.perf_counter()
+    records, failed_batches = extract_clauses(chunks, llm)
+    stats = {"records": len(records), "failed_batches": failed_batches, "stored": not failed_batches}
+    if failed_batches:
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return stats
+    with connect(path) as conn:
+        conn.execute("DELETE FROM clauses WHERE doc_id = ?", (doc_id,))
+        conn.executemany(
+            "INSERT INTO clauses (doc_id, clause_type, value, quote, page) VALUES (?, ?, ?, ?, ?)",
+            [(doc_id, r["clause_type"], r["value"], r["quote"], r["page"]) for r in records]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO indexed_documents (doc_id, records, indexed_at) VALUES (?, ?, ?)",
+            (doc_id, len(records), time.time())
+        )
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def lookup_clauses(doc_id: str, clause_type: str = None, path: str = CLAUSE_DB) -> list[dict]:
+    """
+    Reads clause records of a document from the index.
+
+    Args:
+        doc_id (str): The document ID.
+        clause_type (str): Only return this clause type. Returns all types if omitted.
+        path (str): Path to the SQLite database file.
+
+    Returns:
+        list[dict]: Clause records with clause_type, value, quote and page.
+    """
+    query = "SELECT clause_type, value, quote, page FROM clauses WHERE doc_id = ?"
+    params = [doc_id]
+    if clause_type:
+        query += " AND clause_type = ?"
+        params.append(clause_type)
+    with connect(path) as conn:
+        rows = conn.execute(query + " ORDER BY clause_type, page", params).fetchall()
+    return [dict(zip(("clause_type", "value", "quote", "page"), row)) for row in rows]
+
+
+def route_question(question: str):
+    """
+    Maps a question to the clause type it asks about, by keyword.
+
+    Args:
+        question (str): The question, e.g. "What is the termination notice period?".
+
+    Returns:
+        str or None: The best matching clause type, or None if nothing matches.
+    """
+    question = question.lower()
+    scores = {
+        clause_type: sum(re.search(rf"\b{keyword}\b", question) is not None for keyword in keywords)
+        for clause_type, keywords in clause_keywords.items()
+    }
+    clause_type, score = max(scores.items(), key=lambda item: item[1])
+    return clause_type if score else None
+
+
+def answer_from_index(question: str, doc_id: str, path: str = CLAUSE_DB) -> list[dict]:
+    """
+    Answers a common question by index lookup instead of retrieval and LLM calls.
+
+    Args:
+        question (str): The question.
+        doc_id (str): The document ID.
+        path (str): Path to the SQLite database file.
+
+    Returns:
+        list[dict]: The matching clause records, empty if the question can't be answered from the index.
+    """
+    clause_type = route_question(question)
+    return lookup_clauses(doc_id, clause_type, path) if clause_type else []
+
+
+def format_clause_context(records: list[dict]) -> str:
+    """
+    Formats clause records as compact context for the agent prompts.
+
+    Args:
+        records (list[dict]): The clause records.
+
+    Returns:
+        str: One line per record, "clause_type (p. N): value | quote".
+    """
+    return "\n".join(
+        f"{r['clause_type']} (p. {r['page'] + 1 if r['page'] is not None else '?'}): {r['value']} | {r['quote']}"
+        for r in records
+    )
@@ -0,0 +1,299 @@
+from concurrent.futures import ThreadPoolExecutor
+from packages.agents import agentic_rag, agentic_task, coordinator, resolve_query, retry_llm_call, node_retry_settings
+from packages.clauses import lookup_clauses, route_question
+from packages.prompts import analysis_configs, clause_types, reduce_prompt_template
+from packages.rerank import estimate_tokens
+import time
+
+# Agent calls in flight at once across all documents
+COMPARISON_MAX_WORKERS = 4
+# Prompt tokens for the findings in the consolidated detail call (8k context, minus the answer)
+DETAIL_TOKEN_BUDGET = 5000
+# Smallest size a document's findings are condensed to; more documents than fit are grouped
+MIN_FINDINGS_TOKENS = 150
+# Condensing rounds before oversized findings are truncated
+REDUCE_ROUNDS = 3
+
+route_agents = {
+    "contract": "Contract Analyst",
+    "research": "Legal Researcher",
+    "strategy": "Legal Strategist",
+}
+
+
+def call_with_retries(node: str, fn, *args, **kwargs):
+    """
+    Calls an LLM step with the retry settings of the matching graph node.
+
+    Args:
+        node (str): The node whose settings to use, a key of ``node_retry_settings``.
+        fn (callable): The step to call.
+        *args: Positional arguments of the step.
+        **kwargs: Keyword arguments of the step.
+
+    Returns:
+        Any: The step's result.
+    """
+    settings = node_retry_settings[node]
+    interval = settings["initial_interval"]
+    for attempt in range(1, settings["max_attempts"] + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as exc:
+            if attempt == settings["max_attempts"] or not retry_llm_call(exc):
+                raise
+            print(f"Retrying {node} after error: {exc}")
+            time.sleep(interval)
+            interval *= 2
+
+
+def format_findings(agent_results: dict[str, str]) -> str:
+    """
+    Formats one document's agent results the way ``agentic_task`` formats responses.
+
+    Args:
+        agent_results (dict[str, str]): Results keyed by agent name.
+
+    Returns:
+        str: The formatted findings.
+    """
+    return "\n\n".join(f"{agent}:\n {result}" for agent, result in agent_results.items())
+
+
+def findings_tokens(findings: dict[str, str]) -> int:
+    """
+    Estimated prompt tokens of findings once formatted into a task prompt.
+
+    Args:
+        findings (dict[str, str]): Findings keyed by document (or group) name.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return sum(estimate_tokens(f"{name}:\n {text}") for name, text in findings.items())
+
+
+def group_findings(findings: dict[str, str], groups: int) -> dict[str, str]:
+    """
+    Merges consecutive documents' findings into at most ``groups`` groups.
+
+    Args:
+        findings (dict[str, str]): Findings keyed by document name.
+        groups (int): Maximum number of groups.
+
+    Returns:
+        dict[str, str]: Findings keyed by the comma-separated document names of each group.
+    """
+    items = list(findings.items())
+    size = -(-len(items) // groups)
+    return {
+        ", ".join(name for name, _ in items[i:i + size]): "\n\n".join(f"{name}:\n{text}" for name, text in items[i:i + size])
+        for i in range(0, len(items), size)
+    }
+
+
+def condense_findings(findings: dict[str, str], agents: list[str], budget: int = DETAIL_TOKEN_BUDGET,
+                      max_workers: int = COMPARISON_MAX_WORKERS) -> tuple[dict[str, str], int]:
+    """
+    Reduces per-document findings until they fit the consolidated detail prompt.
+
+    Each round gives every document an equal share of the budget and condenses the ones
+    over their share in parallel. When even the minimum share doesn't fit, documents are
+    grouped first. Findings still over their share after ``REDUCE_ROUNDS`` are truncated.
+
+    Args:
+        findings (dict[str, str]): Findings keyed by document name.
+        agents (list[str]): The agents of the analysis.
+        budget (int): Token budget for all findings together.
+        max_workers (int): Condensing calls in flight at once.
+
+    Returns:
+        tuple[dict[str, str], int]: The findings that fit, and the number of condensing calls made.
+    """
+    calls = 0
+    for _ in range(REDUCE_ROUNDS):
+        if findings_tokens(findings) <= budget:
+            return findings, calls
+        if len(findings) * MIN_FINDINGS_TOKENS > budget:
+            findings = group_findings(findings, max(1, budget // MIN_FINDINGS_TOKENS))
+        share = budget // len(findings)
+        over = [name for name, text in findings.items() if estimate_tokens(f"{name}:\n {text}") > share]
+        # ~0.75 words per token, with headroom for models overshooting the limit
+        prompt = reduce_prompt_template.format(words=int(share * 0.6))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            condensed = list(pool.map(
+                lambda name: call_with_retries("summary", agentic_task, response=findings[name], task="reduce", agents=agents, prompt=prompt),
+                over
+            ))
+        findings = {**findings, **dict(zip(over, condensed))}
+        calls += len(over)
+
+    share = budget // len(findings)
+    return {name: text[:max(0, share - estimate_tokens(f"{name}:\n ")) * 4] for name, text in findings.items()}, calls
+
+
+def align_clauses(doc_ids: dict[str, str], clause_type: str = None) -> dict:
+    """
+    Aligns indexed clause records of several documents by clause type.
+
+    Args:
+        doc_ids (dict[str, str]): Clause index document IDs keyed by document name.
+        clause_type (str): Only align this clause type. Aligns all types if omitted.
+
+    Returns:
+        dict: ``{clause_type: {document name: [records]}}``, only types found in at least one document.
+    """
+    aligned = {}
+    for name, doc_id in doc_ids.items():
+        for record in lookup_clauses(doc_id, clause_type):
+            aligned.setdefault(record["clause_type"], {}).setdefault(name, []).append(record)
+    return {kind: aligned[kind] for kind in clause_types if kind in aligned}
+
+
+def format_aligned_clauses(aligned: dict, names: list[str]) -> str:
+    """
+    Formats aligned clauses as one block per clause type with one line per document.
+
+    Args:
+        aligned (dict): Output of ``align_clauses``.
+        names (list[str]): All document names, so documents missing a clause are listed too.
+
+    Returns:
+        str: The formatted comparison.
+    """
+    blocks = []
+    for kind, by_document in aligned.items():
+        lines = [f"{kind}:"]
+        for name in names:
+            records = by_document.get(name, [])
+            values = "; ".join(
+                f"{r['value']} (p. {r['page'] + 1 if r['page'] is not None else '?'})" for r in records
+            )
+            lines.append(f"- {name}: {values or 'not found'}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def compare_documents(documents: dict, analysis_type: str, custom_query: str = None, doc_ids: dict[str, str] = None,
+                      rerank: bool = False, max_workers: int = COMPARISON_MAX_WORKERS, completed: dict = None) -> dict:
+    """
+    Runs one analysis over several documents and consolidates it into a single report.
+
+    Retrieval and agent analysis run concurrently for every (document, agent) pair with
+    bounded parallelism and the retry settings of the graph's agent nodes. Each
+    document's findings are condensed under a token budget, aligned by clause type from
+    the clause index when the documents are indexed, and the existing detail, summary and
+    recommendation task prompts produce one consolidated report.
+
+    Failed agent runs don't discard the others: they are reported in ``errors`` and the
+    returned ``results`` can be passed back as ``completed`` to only retry what failed.
+
+    Args:
+        documents (dict): Vectorstores keyed by document name.
+        analysis_type (str): The analysis type, a key of ``analysis_configs``.
+        custom_query (str): The custom query, used for "Custom Query" (e.g. "Compare the liability clauses").
+        doc_ids (dict[str, str]): Clause index document IDs keyed by document name.
+        rerank (bool): Rerank retrieved chunks, see ``agentic_rag``.
+        max_workers (int): Agent calls in flight at once.
+        completed (dict): Agent results per document from an earlier attempt of the same
+                          analysis type and query, not re-run. Results of agents outside
+                          the current routes are dropped.
+
+    Returns:
+        dict: ``results`` (agent results per document), ``errors`` (failed agent runs per
+              document, and "Consolidated report" if reporting failed), ``clauses``
+              (aligned clauses), ``reports`` (details, summary, recommendation, empty if
+              any agent run failed) and ``stats`` (timings, condensing calls, detail
+              prompt tokens).
+    """
+    start = time.perf_counter()
+    doc_ids = doc_ids or {}
+    completed = completed or {}
+    routes = coordinator({"analysis_type": analysis_type})
+    query = resolve_query(analysis_type, custom_query)
+    agents = analysis_configs[analysis_type]["agents"]
+
+    def run_agent(job):
+        """
+        Runs one agent over one document.
+
+        Args:
+            job (tuple[str, str]): The document name and task route.
+
+        Returns:
+            str: The agent's result.
+        """
+        name, route = job
+        return call_with_retries(
+            route, agentic_rag, documents[name], task=route, custom_query=query, rerank=rerank, doc_id=doc_ids.get(name)
+        )
+
+    # Only reuse results of agents the current analysis type still runs
+    agent_names = {route_agents[route] for route in routes}
+    results = {
+        name: {agent: result for agent, result in completed.get(name, {}).items() if agent in agent_names}
+        for name in documents
+    }
+    jobs = [(name, route) for name in documents for route in routes if route_agents[route] not in results[name]]
+    print("-"*80, f"Comparing {len(documents)} documents ({len(jobs)} agent runs)", "-"*80)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [(job, pool.submit(run_agent, job)) for job in jobs]
+        for (name, route), future in futures:
+            try:
+                results[name][route_agents[route]] = future.result()
+            except Exception as e:
+                print(f"Agent {route_agents[route]} failed on {name}: {e}")
+                errors.setdefault(name, {})[route_agents[route]] = str(e)
+    agent_seconds = time.perf_counter() - start
+
+    stats = {
+        "documents": len(documents),
+        "agent_runs": len(jobs),
+        "failed_runs": sum(len(failed) for failed in errors.values()),
+        "condense_calls": 0,
+        "detail_prompt_tokens": 0,
+    }
+    aligned = align_clauses(doc_ids, route_question(query or "")) if doc_ids else {}
+    reports = {}
+
+    # Only report once every agent run succeeded, so the report never silently omits a document
+    if not errors:
+        try:
+            response = {}
+            budget = DETAIL_TOKEN_BUDGET
+            if aligned:
+                response["Clause comparison across documents"] = format_aligned_clauses(aligned, list(documents))
+                budget = max(DETAIL_TOKEN_BUDGET // 2, budget - findings_tokens(response))
+            findings, stats["condense_calls"] = condense_findings(
+                {name: format_findings(agent_results) for name, agent_results in results.items()},
+                agents, budget, max_workers
+            )
+            response = {**findings, **response}
+            stats["detail_prompt_tokens"] = findings_tokens(response)
+
+            details = call_with_retries("detail", agentic_task, response=response, task="detail", agents=agents)
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                summary = pool.submit(call_with_retries, "summary", agentic_task, response=details, task="summary", agents=agents)
+                recommendation = pool.submit(call_with_retries, "recommendation", agentic_task, response=details, task="recommendation", agents=agents)
+                reports = {"details": details, "summary": summary.result(), "recommendation": recommendation.result()}
+        except Exception as e:
+            print(f"Consolidated report failed: {e}")
+            errors["Consolidated report"] = {"report": str(e)}
+            reports = {}
+
+    seconds = time.perf_counter() - start
+    stats.update({
+        "seconds": round(seconds, 3),
+        "agent_seconds": round(agent_seconds, 3),
+        "report_seconds": round(seconds - agent_seconds, 3),
+    })
+    return {
+        "results": results,
+        "errors": errors,
+        "clauses": aligned,
+        "reports": reports,
+        "stats": stats,
+    }
@@ -1,15 +1,40 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain_pinecone import PineconeVectorStore
-from langchain.embeddings import HuggingFaceEmbeddings, JinaEmbeddings
-import tempfile, os, time
-from pinecone import Pinecone, ServerlessSpec
+import tempfile, os, time, hashlib
+from packages.backends import load_backend, vectorstore_backends, embedding_backends
+from packages.extraction import extract_pdf_pages
+from packages.clauses import build_clause_index, has_clause_index
 
 import warnings
 warnings.filterwarnings("ignore")
 
 
+def split_documents(docs):
+    """
+    Split page documents into overlapping chunks for embedding.
+
+    Args:
+        docs (list[Document]): The page documents.
+
+    Returns:
+        list[Document]: The chunks.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
+    return splitter.split_documents(docs)
+
+
+def get_embedding():
+    """
+    Returns the Jina embedding model, imported on first use.
+
+    Returns:
+        JinaEmbeddings: The embedding model.
+    """
+    return load_backend(embedding_backends, "jina")(
+        jina_api_key=os.environ.get("JINA_API_KEY")
+    )
+
+
 def load_document_to_pinecone(uploaded_file):  
     """
     Load a PDF document into Pinecone.
@@ -21,6 +46,8 @@ def load_document_to_pinecone(uploaded_file):
         PineconeVectorStore: A vector store of the document.
     """
     
+    from pinecone import Pinecone, ServerlessSpec
+
     # Initialize Pinecone
     pc = Pinecone()
     # Define your index name
@@ -47,20 +74,22 @@ def load_document_to_pinecone(uploaded_file):
 
         print("-"*80,"Load and Chunking","-"*80)
         # Load and split document
-        docs = PyPDFLoader(path).load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-        chunks = splitter.split_documents(docs)
+        docs, stats = extract_pdf_pages(path)
+        print(
+            f"Extracted {stats['pages']} pages in {stats['seconds']}s "
+            f"({stats['pages_per_sec']} pages/sec, {stats['ocr_fraction']:.0%} OCR, "
+            f"{stats['cached_pages']} cached)"
+        )
+        chunks = split_documents(docs)
 
         print("-"*80,"Load Embedding","-"*80)
         # Load Embedding
-        embedding = JinaEmbeddings(
-            jina_api_key=os.environ.get("JINA_API_KEY")
-        )
+        embedding = get_embedding()
         # Load into Pinecone
         index_name = pc.Index(INDEX_NAME)
         print("-"*80,"Ingesting Vector DB","-"*80)
 
-        vectorstore = PineconeVectorStore(
+        vectorstore = load_backend(vectorstore_backends, "pinecone")(
             index=index_name,
             embedding=embedding
         )
@@ -72,12 +101,27 @@ def load_document_to_pinecone(uploaded_file):
         return vectorstore
 
 
-def load_document_to_faiss(uploaded_file):  
+def document_id(uploaded_file) -> str:
+    """
+    Content hash identifying an uploaded document, used as its clause index key.
+
+    Args:
+        uploaded_file (bytes): A PDF file.
+
+    Returns:
+        str: The document ID.
+    """
+    return hashlib.sha256(uploaded_file.getbuffer()).hexdigest()[:32]
+
+
+def load_document_to_faiss(uploaded_file, clause_llm=None):  
     """
     Load a PDF document into a FAISS vector store.
 
     Args:
         uploaded_file (bytes): A PDF file.
+        clause_llm (BaseChatModel): If given, also extract typed clause records into the
+                                    clause index (once per document, keyed by ``document_id``).
 
     Returns:
         FAISS: A vector store of the document.
@@ -91,18 +135,29 @@ def load_document_to_faiss(uploaded_file):
 
         print("-"*80,"Load and Chunking","-"*80)
         # Load and split document
-        docs = PyPDFLoader(path).load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-        chunks = splitter.split_documents(docs)
+        docs, stats = extract_pdf_pages(path)
+        print(
+            f"Extracted {stats['pages']} pages in {stats['seconds']}s "
+            f"({stats['pages_per_sec']} pages/sec, {stats['ocr_fraction']:.0%} OCR, "
+            f"{stats['cached_pages']} cached)"
+        )
+        chunks = split_documents(docs)
 
         print("-"*80,"Load Embedding","-"*80)
         # Load Embedding
-        embedding = JinaEmbeddings(
-            jina_api_key=os.environ.get("JINA_API_KEY")
-        )
+        embedding = get_embedding()
         # Load into FAISS
         print("-"*80,"Ingesting Vector DB","-"*80)
-        vectorstore = FAISS.from_documents(chunks, embedding)
+        vectorstore = load_backend(vectorstore_backends, "faiss").from_documents(chunks, embedding)
+
+        doc_id = document_id(uploaded_file)
+        if clause_llm is not None and not has_clause_index(doc_id):
+            print("-"*80,"Building Clause Index","-"*80)
+            stats = build_clause_index(chunks, doc_id, clause_llm)
+            if stats["stored"]:
+                print(f"Indexed {stats['records']} clause records in {stats['seconds']}s")
+            else:
+                print(f"Clause index not saved, {stats['failed_batches']} batches failed, will retry on next upload")
 
 
         return vectorstore
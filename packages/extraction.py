@@ -0,0 +1,329 @@
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+import hashlib, json, os, time
+
+####################################### Page cache ###################################################
+
+PAGE_CACHE_DIR = os.environ.get(
+    "LEGAL_AGENT_PAGE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "ai-legal-agent", "pages")
+)
+
+# Pages with fewer characters than this are treated as having no text layer
+MIN_TEXT_CHARS = 16
+
+# Documents shorter than this are extracted in-process, a pool costs more than it saves
+PARALLEL_MIN_PAGES = 8
+
+
+def _cache_read(cache_dir: str, key: str):
+    """
+    Read a cached page extraction from disk.
+
+    Args:
+        cache_dir (str): Directory holding the page cache.
+        key (str): The page cache key, see ``page_cache_key``.
+
+    Returns:
+        dict or None: The cached record, or None on a cache miss.
+    """
+    if not cache_dir:
+        return None
+    try:
+        with open(os.path.join(cache_dir, f"{key}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_write(cache_dir: str, key: str, record: dict):
+    """
+    Atomically write a page extraction to the disk cache.
+
+    Args:
+        cache_dir (str): Directory holding the page cache.
+        key (str): The page cache key, see ``page_cache_key``.
+        record (dict): The extraction record to store.
+    """
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+
+
+def file_hash(path: str) -> str:
+    """
+    Hash the whole PDF file.
+
+    Args:
+        path (str): Path to the PDF file.
+
+    Returns:
+        str: The SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_cache_key(pdf_hash: str, page_no: int) -> str:
+    """
+    Cache key of one page: the whole file's hash plus the page number. Hashing a page's
+    own streams is not enough, pages drawn through shared Form XObjects or fonts can have
+    identical content streams but different text.
+
+    Args:
+        pdf_hash (str): The hash of the PDF file, see ``file_hash``.
+        page_no (int): Zero-based page number.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{pdf_hash}-{page_no}"
+
+
+####################################### Extraction backends ###################################################
+
+class PyMuPDFBackend:
+    """
+    Text extraction using PyMuPDF (fitz). Fastest backend, reads blocks in layout order
+    and can rasterise pages for OCR.
+    """
+
+    name = "pymupdf"
+
+    def __init__(self, path: str):
+        import pymupdf
+        self.doc = pymupdf.open(path)
+
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    def extract(self, page_no: int) -> str:
+        blocks = self.doc[page_no].get_text("blocks", sort=True)
+        return "\n".join(block[4].strip() for block in blocks if block[6] == 0)
+
+    def render(self, page_no: int, dpi: int):
+        from PIL import Image
+        pix = self.doc[page_no].get_pixmap(dpi=dpi)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+class PypdfBackend:
+    """
+    Text extraction using pypdf in layout mode, falling back to plain mode (which also
+    reads text inside Form XObjects). Always available, used when PyMuPDF is not
+    installed or fails on a page.
+    """
+
+    name = "pypdf"
+
+    def __init__(self, path: str):
+        from pypdf import PdfReader
+        self.path = path
+        self.reader = PdfReader(path)
+
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def extract(self, page_no: int) -> str:
+        page = self.reader.pages[page_no]
+        text = page.extract_text(extraction_mode="layout") or ""
+        if len(text.strip()) < MIN_TEXT_CHARS:
+            text = page.extract_text() or ""
+        return text
+
+    def render(self, page_no: int, dpi: int):
+        from pdf2image import convert_from_path
+        return convert_from_path(self.path, dpi=dpi, first_page=page_no + 1, last_page=page_no + 1)[0]
+
+
+# Ordered fastest first
+EXTRACTION_BACKENDS = {
+    PyMuPDFBackend.name: PyMuPDFBackend,
+    PypdfBackend.name: PypdfBackend,
+}
+
+
+def open_backends(path: str, names: list[str] = None) -> list:
+    """
+    Open the PDF with every importable backend, fastest first. A backend that fails to
+    open the file is skipped, the others are still used.
+
+    Args:
+        path (str): Path to the PDF file.
+        names (list[str]): Backend names to try. Defaults to all registered backends.
+
+    Returns:
+        list: The opened backends, in order of preference.
+    """
+    backends, errors = [], []
+    for name in names or EXTRACTION_BACKENDS:
+        try:
+            backends.append(EXTRACTION_BACKENDS[name](path))
+        except ImportError:
+            continue
+        except Exception as e:
+            # e.g. pypdf needs cryptography for AES encrypted files, keep the backends that opened
+            print(f"Could not open {path} with {name}: {e}")
+            errors.append(f"{name}: {e}")
+    if not backends:
+        if errors:
+            raise ValueError(f"No PDF extraction backend could open {path} ({'; '.join(errors)})")
+        raise ImportError("No PDF extraction backend available, install pypdf or pymupdf")
+    return backends
+
+
+def ocr_page(backends: list, page_no: int, dpi: int = 300) -> str:
+    """
+    Run local CPU OCR (Tesseract) on a single rasterised page.
+
+    Args:
+        backends (list): Opened backends, the first one able to render is used.
+        page_no (int): Zero-based page number.
+        dpi (int): Render resolution.
+
+    Returns:
+        str: The OCR text, or an empty string when OCR is not installed or fails.
+    """
+    try:
+        import pytesseract
+    except ImportError:
+        return ""
+    for backend in backends:
+        try:
+            return pytesseract.image_to_string(backend.render(page_no, dpi))
+        except ImportError:
+            continue
+        except Exception as e:
+            # e.g. Tesseract or poppler binaries missing, don't fail the whole document
+            print(f"OCR failed for page {page_no + 1} with {backend.name}: {e}")
+            continue
+    return ""
+
+
+def _extract_page_batch(path: str, pdf_hash: str, page_numbers: list[int], backend_names: list[str], cache_dir: str, ocr: bool):
+    """
+    Extract a batch of pages. Runs inside a worker process, so it opens its own handles.
+
+    Args:
+        path (str): Path to the PDF file.
+        pdf_hash (str): The hash of the PDF file, used for the cache keys.
+        page_numbers (list[int]): Zero-based page numbers to extract.
+        backend_names (list[str]): Backend names in order of preference.
+        cache_dir (str): Directory holding the page cache, or None to disable caching.
+        ocr (bool): Whether to OCR pages with no text layer.
+
+    Returns:
+        list[dict]: One record per page with its text, backend, and OCR / cache flags.
+    """
+    backends = open_backends(path, backend_names)
+    records = []
+    for page_no in page_numbers:
+        key = page_cache_key(pdf_hash, page_no)
+        record = _cache_read(cache_dir, key)
+        if record is not None:
+            records.append({**record, "page": page_no, "cached": True})
+            continue
+
+        record = {"text": "", "backend": None, "ocr": False}
+        for backend in backends:
+            try:
+                text = backend.extract(page_no) or ""
+            except Exception:
+                continue
+            if len(text.strip()) > len(record["text"].strip()):
+                record["text"], record["backend"] = text, backend.name
+            if len(text.strip()) >= MIN_TEXT_CHARS:
+                break
+
+        if len(record["text"].strip()) < MIN_TEXT_CHARS:
+            record["ocr"] = True
+            ocr_text = ocr_page(backends, page_no) if ocr else ""
+            if ocr_text.strip():
+                record["text"], record["backend"] = ocr_text, "tesseract"
+
+        # Don't cache empty scans, so they are retried once an OCR engine is installed
+        if record["text"].strip():
+            _cache_write(cache_dir, key, record)
+        records.append({**record, "page": page_no, "cached": False})
+    return records
+
+
+def extract_pdf_pages(path: str, max_workers: int = None, cache_dir: str = PAGE_CACHE_DIR, ocr: bool = True, backend_names: list[str] = None):
+    """
+    Extract the text of every page of a PDF, in parallel across a process pool.
+
+    Each page is read with the fastest available backend, pages with no text layer fall
+    back to local OCR, and extracted text is cached by file hash and page number so
+    re-uploading a document skips extraction.
+
+    Args:
+        path (str): Path to the PDF file.
+        max_workers (int): Size of the process pool. Defaults to the CPU count.
+        cache_dir (str): Directory holding the page cache, or None to disable caching.
+        ocr (bool): Whether to OCR pages with no text layer.
+        backend_names (list[str]): Backend names to try, fastest first.
+
+    Returns:
+        tuple[list[Document], dict]: One Document per page (same metadata as PyPDFLoader)
+            and extraction stats (pages, seconds, pages_per_sec, ocr_pages, ocr_fraction,
+            cached_pages).
+    """
+    start = time.perf_counter()
+    backends = open_backends(path, backend_names)
+    backend_names = [backend.name for backend in backends]
+    page_count = backends[0].page_count()
+    pdf_hash = file_hash(path)
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, page_count))
+    if page_count < PARALLEL_MIN_PAGES:
+        max_workers = 1
+    batch_size = -(-page_count // max_workers) if page_count else 1
+    batches = [list(range(i, min(i + batch_size, page_count))) for i in range(0, page_count, batch_size)]
+
+    if max_workers == 1:
+        results = [_extract_page_batch(path, pdf_hash, batch, backend_names, cache_dir, ocr) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(
+                _extract_page_batch,
+                [path] * len(batches),
+                [pdf_hash] * len(batches),
+                batches,
+                [backend_names] * len(batches),
+                [cache_dir] * len(batches),
+                [ocr] * len(batches),
+            ))
+
+    records = sorted((record for batch in results for record in batch), key=lambda record: record["page"])
+    docs = [
+        Document(
+            page_content=record["text"],
+            metadata={
+                "source": path,
+                "page": record["page"],
+                "extraction": record["backend"],
+                "ocr": record["ocr"],
+            }
+        )
+        for record in records
+    ]
+
+    seconds = time.perf_counter() - start
+    ocr_pages = sum(record["ocr"] for record in records)
+    stats = {
+        "pages": page_count,
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(page_count / seconds, 2) if seconds else 0.0,
+        "ocr_pages": ocr_pages,
+        "ocr_fraction": round(ocr_pages / page_count, 3) if page_count else 0.0,
+        "cached_pages": sum(record["cached"] for record in records),
+    }
+    return docs, stats
@@ -1,5 +1,5 @@
 
-from langchain.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 
 ####################################### Agentic RAG prompts ###################################################
 
@@ -132,4 +132,45 @@ task_prompts = {
     "detail": detail_prompt,
     "summary": summary_prompt,
     "recommendation": recommendation_prompt
-}
\ No newline at end of file
+}
+
+# Condenses findings so many documents fit in one detail prompt, format {words} before use
+reduce_prompt_template = (
+    "Based on this previous analysis:\n"
+    "{{response}}\n\n"
+    "Condense it to at most {words} words. Keep every clause finding, figure, party name "
+    "and page reference, drop repetition and general commentary.\n"
+    "Focus on insights from: {{agents}}"
+)
+
+####################################### Clause extraction prompts ###################################################
+
+clause_types = {
+    "parties": "The contracting parties and their roles",
+    "dates": "Effective date, term, renewal and expiry dates",
+    "payment_terms": "Fees, payment amounts, schedules and invoicing terms",
+    "termination": "Termination rights, notice periods and termination consequences",
+    "liability_cap": "Limitations or caps on liability, excluded damages, indemnity limits",
+    "governing_law": "Governing law, jurisdiction and dispute venue",
+}
+
+clause_extraction_prompt = ChatPromptTemplate(
+    messages=[
+        (
+            "system",
+            "You are a contract analyst extracting structured clause records.\n"
+            "Only extract these clause types:\n"
+            "{clause_types}\n\n"
+            "Respond with a JSON list only, no prose. Each item must be:\n"
+            '{{"type": "<clause type>", "value": "<short normalized answer>", '
+            '"quote": "<exact supporting sentence>", "chunk": <chunk number>}}\n'
+            "Return [] if none of the chunks contain these clauses."
+        ),
+        (
+            "human",
+            "Chunks:\n"
+            "{chunks}\n\n"
+            "JSON:"
+        )
+    ]
+)
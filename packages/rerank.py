@@ -0,0 +1,162 @@
+from langchain_core.runnables import RunnableLambda
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib, threading
+
+####################################### Reranker settings ###################################################
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Candidates pulled from the vectorstore before reranking
+RERANK_FETCH_K = 20
+# Chunks kept after reranking
+RERANK_TOP_N = 4
+# Upper bound on context tokens passed to the agent prompt
+RERANK_TOKEN_BUDGET = 1500
+# Pairs scored per cross-encoder forward pass
+RERANK_BATCH_SIZE = 16
+# Cached (query, chunk) scores
+RERANK_CACHE_SIZE = 4096
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token), good enough for budgeting.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return max(1, len(text) // 4)
+
+
+@lru_cache(maxsize=1)
+def get_cross_encoder(model_name: str = RERANK_MODEL):
+    """
+    Loads the local CPU cross-encoder once per process.
+
+    Args:
+        model_name (str): The sentence-transformers cross-encoder model name.
+
+    Returns:
+        CrossEncoder: The loaded reranker model.
+    """
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device="cpu")
+
+
+def cross_encoder_scores(pairs: list[tuple[str, str]], batch_size: int = RERANK_BATCH_SIZE) -> list[float]:
+    """
+    Score (query, chunk) pairs with the local cross-encoder.
+
+    Args:
+        pairs (list[tuple[str, str]]): The (query, chunk) pairs to score.
+        batch_size (int): Pairs per forward pass.
+
+    Returns:
+        list[float]: One relevance score per pair.
+    """
+    return [float(score) for score in get_cross_encoder().predict(pairs, batch_size=batch_size)]
+
+
+class Reranker:
+    """
+    Reranks retrieved chunks with a scoring function and keeps the best ones under a
+    token budget. Scores are cached by (query, chunk) so repeated agents and reruns
+    over the same document only score new pairs.
+    """
+
+    def __init__(self, score_fn=cross_encoder_scores, top_n: int = RERANK_TOP_N,
+                 token_budget: int = RERANK_TOKEN_BUDGET, cache_size: int = RERANK_CACHE_SIZE):
+        self.score_fn = score_fn
+        self.top_n = top_n
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        # Agent nodes run concurrently and share this reranker
+        self.lock = threading.Lock()
+
+    def _key(self, query: str, text: str) -> str:
+        return hashlib.sha1(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def score(self, query: str, docs: list) -> list[float]:
+        """
+        Score documents against the query, only running the model on uncached pairs.
+
+        Args:
+            query (str): The question being answered.
+            docs (list[Document]): The candidate documents.
+
+        Returns:
+            list[float]: One relevance score per document.
+        """
+        keys = [self._key(query, doc.page_content) for doc in docs]
+        with self.lock:
+            scores = {key: self.cache[key] for key in keys if key in self.cache}
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+        if missing:
+            new_scores = self.score_fn([(query, docs[i].page_content) for i in missing])
+            for i, score in zip(missing, new_scores):
+                scores[keys[i]] = score
+        with self.lock:
+            for key in keys:
+                self.cache[key] = scores[key]
+                self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return [scores[key] for key in keys]
+
+    def rerank(self, query: str, docs: list) -> list:
+        """
+        Keep the highest scoring documents, at most top_n and within the token budget.
+
+        Args:
+            query (str): The question being answered.
+            docs (list[Document]): The candidate documents.
+
+        Returns:
+            list[Document]: The kept documents, best first.
+        """
+        ranked = sorted(zip(self.score(query, docs), docs), key=lambda pair: pair[0], reverse=True)
+        kept, used = [], 0
+        for _, doc in ranked:
+            tokens = estimate_tokens(doc.page_content)
+            if kept and used + tokens > self.token_budget:
+                continue
+            kept.append(doc)
+            used += tokens
+            if len(kept) >= self.top_n:
+                break
+        return kept
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> Reranker:
+    """
+    Returns the shared process-wide reranker, backed by the local cross-encoder.
+
+    Returns:
+        Reranker: The shared reranker.
+    """
+    return Reranker()
+
+
+def reranked_retriever(vectorstore, reranker: Reranker = None, fetch_k: int = RERANK_FETCH_K):
+    """
+    Build a retrieval step that over-fetches candidates and reranks them.
+
+    Args:
+        vectorstore (VectorStore): The vectorstore to retrieve candidates from.
+        reranker (Reranker): The reranker to use. Defaults to the shared reranker.
+        fetch_k (int): Number of candidates to pull from the vectorstore.
+
+    Returns:
+        RunnableLambda: A runnable mapping a query string to the kept documents.
+    """
+    def retrieve(query: str):
+        candidates = vectorstore.similarity_search(query, k=fetch_k)
+        return (reranker or get_reranker()).rerank(query, candidates)
+
+    return RunnableLambda(retrieve)
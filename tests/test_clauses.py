@@ -0,0 +1,145 @@
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from packages.clauses import (
+    answer_from_index, build_clause_index, connect, extract_clauses, has_clause_index, lookup_clauses,
+    parse_clause_records, route_question
+)
+import json, pytest, sqlite3
+
+CHUNKS = [
+    Document(page_content="This Agreement is between Acme Corp and Globex Ltd.", metadata={"page": 0}),
+    Document(page_content="Either party may terminate with ninety days written notice.", metadata={"page": 1}),
+    Document(page_content="Liability is capped at the fees paid in the last twelve months.", metadata={"page": 2}),
+    Document(page_content="This Agreement is governed by the laws of Delaware.", metadata={"page": 3}),
+]
+
+# What the model finds in each chunk, keyed by a phrase of the chunk
+FINDINGS = {
+    "between Acme": {"type": "parties", "value": "Acme Corp, Globex Ltd", "quote": "between Acme Corp and Globex Ltd"},
+    "ninety days": {"type": "termination", "value": "90 days notice", "quote": "ninety days written notice"},
+    "capped": {"type": "liability_cap", "value": "Fees paid in 12 months", "quote": "capped at the fees paid"},
+    "Delaware": {"type": "governing_law", "value": "Delaware", "quote": "governed by the laws of Delaware"},
+}
+
+
+class ExtractionLLM:
+    """
+    Fake extraction model answering with the findings of the chunks in the prompt.
+    Prompts containing a phrase in ``failing`` raise, ``fail_once`` ones only on the first call.
+    """
+
+    def __init__(self, findings: dict = FINDINGS, failing: set = frozenset(), fail_once: set = frozenset()):
+        self.findings = findings
+        self.failing = set(failing)
+        self.fail_once = set(fail_once)
+        self.calls = 0
+
+    def __call__(self, prompt_value):
+        self.calls += 1
+        text = prompt_value.to_string()
+        chunks = text.split("[chunk ")[1:]
+        for phrase in list(self.fail_once):
+            if phrase in text:
+                self.fail_once.discard(phrase)
+                raise ConnectionError("connection reset")
+        if any(phrase in text for phrase in self.failing):
+            raise ConnectionError("connection reset")
+        items = [
+            {**finding, "chunk": i}
+            for i, chunk in enumerate(chunks)
+            for phrase, finding in self.findings.items() if phrase in chunk
+        ]
+        return AIMessage(content=json.dumps(items))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "clauses.sqlite")
+
+
+def test_parse_clause_records_maps_chunks_to_pages():
+    batch = CHUNKS[2:]
+    output = [
+        {"type": "liability_cap", "value": "Fees paid", "quote": "capped", "chunk": 0},
+        {"type": "governing_law", "value": "Delaware", "quote": "laws of Delaware", "chunk": 1},
+        {"type": "warranty", "value": "not a clause type", "chunk": 0},
+        {"type": "termination", "value": "bad chunk index", "chunk": 7},
+        "not a record",
+    ]
+
+    records = parse_clause_records(output, batch)
+
+    assert [(r["clause_type"], r["page"]) for r in records] == [
+        ("liability_cap", 2), ("governing_law", 3), ("termination", 2)
+    ]
+
+
+def test_extract_clauses_retries_failed_batches():
+    llm = ExtractionLLM(fail_once={"Delaware"})
+
+    records, failed = extract_clauses(CHUNKS, RunnableLambda(llm), chunks_per_call=2)
+
+    assert failed == 0
+    assert {r["clause_type"] for r in records} == {"parties", "termination", "liability_cap", "governing_law"}
+    assert llm.calls == 3
+
+
+def test_partial_index_is_not_stored(db_path):
+    stats = build_clause_index(CHUNKS, "doc", RunnableLambda(ExtractionLLM(failing={"Delaware"})), path=db_path)
+
+    assert stats["failed_batches"] == 1
+    assert stats["stored"] is False
+    assert not has_clause_index("doc", path=db_path)
+    assert lookup_clauses("doc", path=db_path) == []
+
+
+def test_document_without_clauses_is_indexed_once(db_path):
+    llm = ExtractionLLM(findings={})
+
+    stats = build_clause_index(CHUNKS, "doc", RunnableLambda(llm), path=db_path)
+
+    assert stats["stored"] is True
+    assert stats["records"] == 0
+    assert has_clause_index("doc", path=db_path)
+
+
+def test_existing_clause_rows_count_as_indexed(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE clauses (doc_id TEXT NOT NULL, clause_type TEXT NOT NULL, value TEXT, quote TEXT, page INTEGER)")
+    conn.execute("INSERT INTO clauses VALUES ('old', 'termination', '30 days', 'thirty days', 4)")
+    conn.commit()
+    conn.close()
+
+    assert has_clause_index("old", path=db_path)
+    with connect(db_path) as conn:
+        assert conn.execute("SELECT records FROM indexed_documents WHERE doc_id = 'old'").fetchone() == (1,)
+
+
+def test_lookup_and_answer_from_index(db_path):
+    build_clause_index(CHUNKS, "doc", RunnableLambda(ExtractionLLM()), path=db_path)
+
+    assert [r["clause_type"] for r in lookup_clauses("doc", path=db_path)] == [
+        "governing_law", "liability_cap", "parties", "termination"
+    ]
+    records = answer_from_index("What is the termination notice period?", "doc", path=db_path)
+    assert [(r["value"], r["page"]) for r in records] == [("90 days notice", 1)]
+    assert answer_from_index("Who are the lawyers?", "doc", path=db_path) == []
+    assert lookup_clauses("other", path=db_path) == []
+
+
+@pytest.mark.parametrize("question, clause_type", [
+    ("What is the termination notice period?", "termination"),
+    ("Can we cancel early?", "termination"),
+    ("Is our liability capped?", "liability_cap"),
+    ("Who are the parties to the agreement?", "parties"),
+    ("When does the agreement expire?", "dates"),
+    ("When are invoices payable?", "payment_terms"),
+    ("Which court has jurisdiction?", "governing_law"),
+    ("Analyze potential legal risks and liabilities in this document.", "liability_cap"),
+    ("Who are the lawyers?", None),
+    ("What is the capital of the company?", None),
+    ("Review this contract and identify key terms, obligations, and potential issues.", None),
+])
+def test_route_question(question, clause_type):
+    assert route_question(question) == clause_type
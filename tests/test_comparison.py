@@ -0,0 +1,56 @@
+from packages import comparison
+from packages.prompts import analysis_configs
+import pytest
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replaces the agents and report tasks with fakes, records the agent runs."""
+    calls = []
+
+    def fake_rag(vectorstore, task, custom_query=None, rerank=False, doc_id=None):
+        calls.append((vectorstore, task, custom_query))
+        return f"{task} findings for {vectorstore}"
+
+    monkeypatch.setattr(comparison, "agentic_rag", fake_rag)
+    monkeypatch.setattr(comparison, "agentic_task", lambda response, task, agents, prompt=None: f"{task} report")
+    return calls
+
+
+def test_retry_only_runs_failed_agents(calls):
+    documents = {"a.pdf": "a", "b.pdf": "b"}
+    completed = {"a.pdf": {"Contract Analyst": "earlier", "Legal Strategist": "earlier"}}
+
+    result = comparison.compare_documents(documents, "Risk Assessment", completed=completed)
+
+    assert sorted((vectorstore, task) for vectorstore, task, _ in calls) == [("b", "contract"), ("b", "strategy")]
+    assert result["results"]["a.pdf"]["Contract Analyst"] == "earlier"
+    assert result["reports"]["details"] == "detail report"
+
+
+def test_completed_results_of_other_agents_are_dropped(calls):
+    completed = {"a.pdf": {"Contract Analyst": "earlier", "Legal Strategist": "earlier"}}
+
+    result = comparison.compare_documents({"a.pdf": "a"}, "Contract Review", completed=completed)
+
+    assert calls == []
+    assert result["results"] == {"a.pdf": {"Contract Analyst": "earlier"}}
+
+
+def test_failed_agent_keeps_other_results(calls, monkeypatch):
+    fake_rag = comparison.agentic_rag
+
+    def failing_rag(vectorstore, task, **kwargs):
+        if vectorstore == "b":
+            raise ValueError("context too long")
+        return fake_rag(vectorstore, task, **kwargs)
+
+    monkeypatch.setattr(comparison, "agentic_rag", failing_rag)
+
+    result = comparison.compare_documents({"a.pdf": "a", "b.pdf": "b"}, "Contract Review")
+
+    assert result["errors"] == {"b.pdf": {"Contract Analyst": "context too long"}}
+    assert result["results"]["a.pdf"] == {"Contract Analyst": "contract findings for a"}
+    assert result["reports"] == {}
+    # The preset query is resolved for the agents
+    assert calls[0][2] == analysis_configs["Contract Review"]["query"]
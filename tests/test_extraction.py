@@ -0,0 +1,111 @@
+from packages import extraction
+from packages.extraction import extract_pdf_pages, open_backends, PypdfBackend
+import pytest, sys, types
+
+pymupdf = pytest.importorskip("pymupdf")
+
+PAGE_TEXTS = ["Termination requires ninety days written notice.", "", "Liability is capped at the fees paid."]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    """Three page PDF, the middle page is blank like an unscanned image page."""
+    doc = pymupdf.open()
+    for text in PAGE_TEXTS:
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    path = tmp_path / "contract.pdf"
+    doc.save(path)
+    return str(path)
+
+
+class BrokenBackend:
+    """Backend that can't open any file, e.g. pypdf without cryptography on an AES PDF."""
+
+    name = "broken"
+
+    def __init__(self, path: str):
+        raise RuntimeError("cryptography>=3.1 is required for AES algorithm")
+
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pypdf"])
+def test_extracts_each_page(pdf_path, tmp_path, backend):
+    docs, stats = extract_pdf_pages(pdf_path, cache_dir=str(tmp_path / "cache"), ocr=False, backend_names=[backend])
+
+    assert [doc.metadata["page"] for doc in docs] == [0, 1, 2]
+    assert "ninety days" in docs[0].page_content
+    assert "capped at the fees" in docs[2].page_content
+    assert docs[0].metadata["extraction"] == backend
+    assert stats["pages"] == 3
+
+
+def test_blank_page_is_flagged_for_ocr_and_not_cached(pdf_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    docs, stats = extract_pdf_pages(pdf_path, cache_dir=cache_dir, ocr=False)
+
+    assert docs[1].page_content.strip() == ""
+    assert docs[1].metadata["ocr"] is True
+    assert stats["ocr_pages"] == 1
+
+    # Text pages come from the cache, the blank page is extracted again
+    docs, stats = extract_pdf_pages(pdf_path, cache_dir=cache_dir, ocr=False)
+    assert stats["cached_pages"] == 2
+    assert "ninety days" in docs[0].page_content
+
+
+def test_blank_page_uses_ocr_text(pdf_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction, "ocr_page", lambda backends, page_no: f"scanned page {page_no + 1}")
+
+    docs, stats = extract_pdf_pages(pdf_path, cache_dir=str(tmp_path / "cache"))
+
+    assert docs[1].page_content == "scanned page 2"
+    assert docs[1].metadata["extraction"] == "tesseract"
+    assert docs[0].metadata["ocr"] is False
+
+
+def test_failed_ocr_keeps_empty_page(pdf_path, tmp_path, monkeypatch):
+    class NoRenderBackend(PypdfBackend):
+        def render(self, page_no, dpi):
+            raise OSError("poppler not installed")
+
+    monkeypatch.setitem(sys.modules, "pytesseract", types.SimpleNamespace(image_to_string=lambda image: "unused"))
+    monkeypatch.setattr(extraction, "EXTRACTION_BACKENDS", {"pypdf": NoRenderBackend})
+
+    docs, stats = extract_pdf_pages(pdf_path, cache_dir=str(tmp_path / "cache"))
+
+    assert docs[1].page_content == ""
+    assert docs[1].metadata["ocr"] is True
+    assert "ninety days" in docs[0].page_content
+
+
+def test_cache_is_keyed_by_file(pdf_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    extract_pdf_pages(pdf_path, cache_dir=cache_dir, ocr=False)
+
+    other = pymupdf.open()
+    for text in ["Payment is due within thirty days.", "", "Governed by the laws of Delaware."]:
+        page = other.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    other_path = str(tmp_path / "other.pdf")
+    other.save(other_path)
+
+    docs, stats = extract_pdf_pages(other_path, cache_dir=cache_dir, ocr=False)
+    assert stats["cached_pages"] == 0
+    assert "thirty days" in docs[0].page_content
+
+
+def test_backend_that_fails_to_open_is_skipped(pdf_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACTION_BACKENDS", {"broken": BrokenBackend, **extraction.EXTRACTION_BACKENDS})
+
+    assert [backend.name for backend in open_backends(pdf_path)] == ["pymupdf", "pypdf"]
+    docs, _ = extract_pdf_pages(pdf_path, cache_dir=str(tmp_path / "cache"), ocr=False)
+    assert "ninety days" in docs[0].page_content
+
+
+def test_raises_when_no_backend_opens(pdf_path, monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACTION_BACKENDS", {"broken": BrokenBackend})
+
+    with pytest.raises(ValueError, match="broken"):
+        open_backends(pdf_path)
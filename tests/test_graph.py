@@ -0,0 +1,151 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.vectorstores import InMemoryVectorStore
+from packages import agents
+from packages.prompts import analysis_configs
+from packages.rerank import Reranker, reranked_retriever
+import pytest
+
+pytest.importorskip("langgraph")
+
+CHUNKS = [
+    "The Supplier's liability is capped at the fees paid in the preceding twelve months.",
+    "Either party may terminate this Agreement with ninety days written notice.",
+    "This Agreement is governed by the laws of the State of Delaware.",
+    "Invoices are payable within thirty days of receipt.",
+]
+
+
+class ProviderError(Exception):
+    """Provider SDK error carrying an HTTP status, like the Groq SDK's APIStatusError."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class RecordingLLM:
+    """
+    Stand-in for ``get_llm`` that records every prompt and answers with the task name.
+    Tasks in ``failing`` raise their exception instead.
+    """
+
+    def __init__(self):
+        self.prompts = []
+        self.failing = {}
+
+    def __call__(self, task: str = "default"):
+        def answer(prompt_value):
+            self.prompts.append((task, prompt_value.to_string()))
+            if task in self.failing:
+                raise self.failing[task]
+            return AIMessage(content=f"{task} answer")
+
+        return RunnableLambda(answer)
+
+
+@pytest.fixture
+def vectorstore():
+    store = InMemoryVectorStore(DeterministicFakeEmbedding(size=32))
+    store.add_documents([Document(page_content=chunk, metadata={"page": i}) for i, chunk in enumerate(CHUNKS)])
+    return store
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    llm = RecordingLLM()
+    monkeypatch.setattr(agents, "get_llm", llm)
+    return llm
+
+
+def test_preset_analysis_retrieves_and_reranks_with_its_query(vectorstore, llm, monkeypatch):
+    scored = []
+
+    def score_fn(pairs):
+        scored.extend(pairs)
+        return [float(len(text)) for _, text in pairs]
+
+    reranker = Reranker(score_fn=score_fn)
+    monkeypatch.setattr(agents, "reranked_retriever", lambda vs: reranked_retriever(vs, reranker=reranker, fetch_k=4))
+    query = analysis_configs["Contract Review"]["query"]
+
+    _, final_state = agents.run_analysis(
+        agents.build_langgraph(), analysis_type="Contract Review", custom_query="", vectorstore=vectorstore, rerank=True
+    )
+
+    assert final_state["custom_query"] == query
+    assert scored and all(pair_query == query for pair_query, _ in scored)
+    agent_prompts = [prompt for task, prompt in llm.prompts if task == "contract"]
+    assert agent_prompts and all(query in prompt for prompt in agent_prompts)
+    assert set(final_state["reports"]) == {"details", "summary", "recommendation"}
+
+
+def test_custom_query_is_kept(vectorstore, llm):
+    _, final_state = agents.run_analysis(
+        agents.build_langgraph(), analysis_type="Custom Query", custom_query="What is the notice period?", vectorstore=vectorstore
+    )
+
+    assert final_state["custom_query"] == "What is the notice period?"
+    assert any("What is the notice period?" in prompt for task, prompt in llm.prompts if task == "contract")
+
+
+@pytest.mark.parametrize("exc, retried", [
+    (ProviderError(429), True),
+    (ProviderError(503), True),
+    (ProviderError(401), False),
+    (ProviderError(400), False),
+    (ConnectionError("reset"), True),
+    (ValueError("bad output"), False),
+])
+def test_retry_llm_call(exc, retried):
+    assert agents.retry_llm_call(exc) is retried
+
+
+def test_resume_skips_completed_agents(vectorstore, llm, tmp_path):
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    legal_ai = agents.build_langgraph(checkpointer=agents.get_checkpointer(str(tmp_path / "checkpoints.sqlite")))
+    llm.failing["strategy"] = ProviderError(401)
+
+    with pytest.raises(ProviderError):
+        agents.run_analysis(legal_ai, analysis_type="Risk Assessment", custom_query="", vectorstore=vectorstore, run_id="run")
+    # Client errors are not retried
+    assert [task for task, _ in llm.prompts].count("strategy") == 1
+
+    del llm.failing["strategy"]
+    llm.prompts.clear()
+    final_state = agents.resume_analysis(legal_ai, run_id="run", vectorstore=vectorstore)
+
+    tasks = [task for task, _ in llm.prompts]
+    assert "contract" not in tasks
+    assert tasks.count("strategy") == 1
+    assert set(final_state["results"]) == {"Contract Analyst", "Legal Strategist"}
+    assert set(final_state["reports"]) == {"details", "summary", "recommendation"}
+    # The entry node's query was checkpointed too
+    assert final_state["custom_query"] == analysis_configs["Risk Assessment"]["query"]
+
+
+def test_indexed_clauses_replace_retrieved_chunks(vectorstore, llm, monkeypatch):
+    record = {"clause_type": "liability_cap", "value": "Fees paid in 12 months", "quote": "capped at the fees paid", "page": 0}
+    monkeypatch.setattr(agents, "lookup_clauses", lambda doc_id, clause_type: [record] if clause_type == "liability_cap" else [])
+
+    _, final_state = agents.run_analysis(
+        agents.build_langgraph(), analysis_type="Risk Assessment", custom_query="", vectorstore=vectorstore, doc_id="doc"
+    )
+
+    prompt = next(prompt for task, prompt in llm.prompts if task == "contract")
+    assert "Indexed clauses:\nliability_cap (p. 1): Fees paid in 12 months" in prompt
+    assert sum(chunk in prompt for chunk in CHUNKS) == agents.CLAUSE_CONTEXT_CHUNKS
+
+
+def test_chunks_are_kept_without_matching_clauses(vectorstore, llm, monkeypatch):
+    monkeypatch.setattr(agents, "lookup_clauses", lambda doc_id, clause_type: [])
+
+    agents.run_analysis(
+        agents.build_langgraph(), analysis_type="Risk Assessment", custom_query="", vectorstore=vectorstore, doc_id="doc"
+    )
+
+    prompt = next(prompt for task, prompt in llm.prompts if task == "contract")
+    assert "Indexed clauses" not in prompt
+    assert sum(chunk in prompt for chunk in CHUNKS) == len(CHUNKS)
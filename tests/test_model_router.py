@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompt_values import StringPromptValue
+from packages.agents import ModelRouter
+import pytest, sys, threading
+
+PROMPT = StringPromptValue(text="What is the termination notice period?")
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class RateLimitedChatModel(FakeListChatModel):
+    """Fake chat model that is always rate limited."""
+
+    def _call(self, *args, **kwargs):
+        raise RateLimitError("rate limited")
+
+
+def make_router(limited: set[str] = frozenset(), sleep: float = None, **kwargs) -> ModelRouter:
+    def factory(model: str):
+        if model in limited:
+            return RateLimitedChatModel(responses=[""])
+        return FakeListChatModel(responses=[f"answer from {model}"], sleep=sleep)
+
+    routes = {
+        "detail": ["llama3-70b-8192", "llama3-8b-8192"],
+        "default": ["llama3-8b-8192"],
+    }
+    return ModelRouter(routes=routes, chat_model_factory=factory, **kwargs)
+
+
+def test_falls_back_on_rate_limit_and_records_usage():
+    router = make_router(limited={"llama3-70b-8192"})
+
+    assert router.invoke("detail", PROMPT).content == "answer from llama3-8b-8192"
+    # The limited model is skipped during its cooldown
+    assert router.invoke("detail", PROMPT).content == "answer from llama3-8b-8192"
+
+    usage = router.usage_report()
+    assert usage["llama3-70b-8192"]["calls"] == 1
+    assert usage["llama3-70b-8192"]["errors"] == 1
+    assert usage["llama3-8b-8192"]["calls"] == 2
+    assert usage["llama3-8b-8192"]["errors"] == 0
+    assert usage["llama3-8b-8192"]["input_tokens"] > 0
+    assert usage["llama3-8b-8192"]["output_tokens"] > 0
+    assert usage["llama3-8b-8192"]["cost"] > 0
+    assert usage["llama3-8b-8192"]["tasks"] == {"detail": 2}
+
+
+def test_usage_is_reported_per_run():
+    router = make_router()
+
+    router.invoke("detail", PROMPT, {"configurable": {"thread_id": "run-1"}})
+    router.invoke("detail", PROMPT, {"configurable": {"thread_id": "run-2"}})
+    router.invoke("detail", PROMPT, {"configurable": {"thread_id": "run-2"}})
+    router.invoke("detail", PROMPT)
+
+    assert router.usage_report("run-1")["llama3-70b-8192"]["calls"] == 1
+    assert router.usage_report("run-2")["llama3-70b-8192"]["calls"] == 2
+    assert router.usage_report()["llama3-70b-8192"]["calls"] == 4
+    assert router.usage_report("unknown") == {}
+
+
+def test_raises_when_every_model_is_rate_limited():
+    router = make_router(limited={"llama3-70b-8192", "llama3-8b-8192"})
+
+    with pytest.raises(RateLimitError):
+        router.invoke("detail", PROMPT)
+    assert router.usage_report()["llama3-8b-8192"]["errors"] == 1
+
+
+def test_max_in_flight_is_enforced_across_threads():
+    router = make_router(max_in_flight=1, sleep=0.05)
+    peak, current, lock = {}, {}, threading.Lock()
+    chat_model = router.chat_model
+
+    def counting_chat_model(model):
+        """Wraps the fake model to record the peak number of concurrent calls per model."""
+        inner = chat_model(model)
+
+        class Counting:
+            def invoke(self, *args, **kwargs):
+                with lock:
+                    current[model] = current.get(model, 0) + 1
+                    peak[model] = max(peak.get(model, 0), current[model])
+                try:
+                    return inner.invoke(*args, **kwargs)
+                finally:
+                    with lock:
+                        current[model] -= 1
+
+        return Counting()
+
+    router.chat_model = counting_chat_model
+    # Switch threads as often as possible so a check-then-increment race would show up
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            answers = list(pool.map(lambda _: router.invoke("detail", PROMPT).content, range(64)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert peak["llama3-70b-8192"] == 1
+    assert "answer from llama3-8b-8192" in answers
+    assert router.in_flight == {"llama3-70b-8192": 0, "llama3-8b-8192": 0}